@@ -3,12 +3,23 @@ Christmas Wishlist App - Main Application (Improved & Consolidated)
 A beautiful, festive, multi-user Christmas wishlist app with authentication.
 """
 
+import atexit
 import gradio as gr
-import json
-import uuid
+import hashlib
+import hmac
+import html
+import orjson
+import os
+import re
+import secrets
+import threading
+import time
+import copy
 import datetime
+from collections import defaultdict
 from pathlib import Path
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
+from PIL import Image
 
 # 1. Configuration Constants
 # ==========================
@@ -26,9 +37,26 @@ USER_CREDENTIALS = {
 # List of all users
 ALL_USERS = list(USER_CREDENTIALS.keys())
 
+# For each user, everybody else (precomputed for the fixed user set)
+_OTHERS_BY_USER = {u: tuple(x for x in ALL_USERS if x != u) for u in ALL_USERS}
+
+# SHA-256 digests of the passwords, so logins compare fixed-size digests in constant time
+PASSWORD_HASHES = {user: hashlib.sha256(pw.encode()).digest() for user, pw in USER_CREDENTIALS.items()}
+
 # Data file path
 DATA_FILE = Path("wunschliste.json")
 
+# Append-only journal of mutations, folded into DATA_FILE shortly after each burst of edits.
+# Only this app replays it: other readers of DATA_FILE (the Streamlit app) see a change once it
+# is compacted, so the journal must not be left standing (see append_event/start_flusher).
+LOG_FILE = Path("wunschliste.log")
+
+# Seconds the background flusher waits for a burst of edits to settle before compacting
+FLUSH_DELAY = 0.5
+
+# Bounding box for the downscaled previews shown on the wish cards
+THUMBNAIL_SIZE = (200, 200)
+
 
 # 2. Styles and Scripts
 # =====================
@@ -69,34 +97,52 @@ CSS_STYLES = """
 
 JAVASCRIPT_CODE = """
 <script>
+// Hidden trigger inputs/buttons, looked up once and looked up again only after Gradio replaced them
+const gradioNodes = new Map();
+
+function findCached(key, find) {
+    let node = gradioNodes.get(key);
+    if (!node || !node.isConnected) {
+        node = find();
+        if (node) gradioNodes.set(key, node);
+    }
+    return node;
+}
+
+function findGradioInput(label) {
+    return findCached('input:' + label, function() {
+        for (const inp of document.querySelectorAll('input[type="text"]')) {
+            if (inp.parentElement && inp.parentElement.querySelector('label')?.textContent === label) return inp;
+        }
+        return null;
+    });
+}
+
+function findGradioButton(text) {
+    return findCached('button:' + text, function() {
+        for (const btn of document.querySelectorAll('button')) {
+            if (btn.textContent.trim() === text) return btn;
+        }
+        return null;
+    });
+}
+
 // Helper function to find and click hidden Gradio buttons
 function triggerGradio(inputId, buttonText, value) {
-    const inputs = document.querySelectorAll('input[type="text"]');
-    let targetInput = null;
-    for (let inp of inputs) {
-        if (inp.parentElement && inp.parentElement.querySelector('label')?.textContent === inputId) {
-            targetInput = inp;
-            break;
-        }
-    }
+    const targetInput = findGradioInput(inputId);
     if (!targetInput) {
         console.error('Gradio input with label "' + inputId + '" not found.');
         return;
     }
     targetInput.value = value;
     targetInput.dispatchEvent(new Event('input', { bubbles: true }));
-    const buttons = document.querySelectorAll('button');
-    let triggerButton = null;
-    for (let btn of buttons) {
-        if (btn.textContent.trim() === buttonText) {
-            triggerButton = btn;
-            break;
-        }
-    }
+    const triggerButton = findGradioButton(buttonText);
     if (!triggerButton) {
         console.error('Gradio button with text "' + buttonText + '" not found.');
         return;
     }
+    // Gradio pushes the new textbox value to its store asynchronously; clicking on the same
+    // tick could send the previous wish id, so give the update time to land first
     setTimeout(function() { triggerButton.click(); }, 50);
 }
 
@@ -124,13 +170,29 @@ function deleteWish(wishId) {
     }
 }
 
+// Replace a single rendered card in place with server-rendered HTML
+function updateCard(patch) {
+    if (!patch) return;
+    const card = document.getElementById('wish-' + patch.id);
+    if (card) card.outerHTML = patch.html;
+}
+
 // Snow effect initialization
 setTimeout(function() {
     const canvas = document.querySelector('.snow');
     if (!canvas) return;
     const ctx = canvas.getContext('2d');
+    if (!ctx) return;
     let w = window.innerWidth, h = window.innerHeight;
     canvas.width = w; canvas.height = h;
+    // Pre-render a single flake once; every frame only blits this sprite
+    const sprite = document.createElement('canvas');
+    sprite.width = sprite.height = 16;
+    const spriteCtx = sprite.getContext('2d');
+    spriteCtx.fillStyle = 'rgba(255,255,255,0.85)';
+    spriteCtx.beginPath();
+    spriteCtx.arc(8, 8, 8, 0, Math.PI*2, true);
+    spriteCtx.fill();
     let flakes = [];
     for (let i = 0; i < 70; i++) {
         flakes.push({
@@ -141,32 +203,35 @@ setTimeout(function() {
         });
     }
     function draw() {
-        if (!ctx) return;
         ctx.clearRect(0,0,w,h);
-        ctx.fillStyle = 'rgba(255,255,255,0.85)';
-        ctx.beginPath();
         for (let i = 0; i < flakes.length; i++) {
             let f = flakes[i];
-            ctx.moveTo(f.x, f.y);
-            ctx.arc(f.x, f.y, f.r, 0, Math.PI*2, true);
+            ctx.drawImage(sprite, f.x - f.r, f.y - f.r, f.r*2, f.r*2);
         }
-        ctx.fill();
-        update();
     }
     let angle = 0;
-    function update() {
-        angle += 0.002;
+    function update(dt) {
+        angle += 0.002 * dt;
         for (let i = 0; i < flakes.length; i++) {
             let f = flakes[i];
-            f.y += Math.pow(f.d, 2) + 1;
-            f.x += Math.sin(angle) * 1.2;
+            f.y += (Math.pow(f.d, 2) + 1) * dt;
+            f.x += Math.sin(angle) * 1.2 * dt;
             if (f.y > h) { 
                 f.x = Math.random()*w; 
                 f.y = -5; 
             }
         }
     }
-    setInterval(draw, 33);
+    let last = performance.now();
+    function loop(now) {
+        // dt is measured in steps of the old 33 ms interval, capped after the tab was hidden
+        const dt = Math.min((now - last) / 33, 3);
+        last = now;
+        update(dt);
+        draw();
+        requestAnimationFrame(loop);
+    }
+    requestAnimationFrame(loop);
     window.addEventListener('resize', function() {
         w = window.innerWidth; 
         h = window.innerHeight;
@@ -179,36 +244,254 @@ setTimeout(function() {
 </script>
 """
 
+def _minify_css(css: str) -> str:
+    """Drops comments and collapses whitespace in a CSS string."""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    return re.sub(r"\s*([{};,])\s*", r"\1", css).strip()
+
+def _minify_js(js: str) -> str:
+    """Drops whole-line // comments, indentation and blank lines from a JS string."""
+    js = re.sub(r"^\s*//.*$", "", js, flags=re.M)
+    return "\n".join(line.strip() for line in js.splitlines() if line.strip())
+
+# Minified once at import; the page injects these on every load
+STYLES_HTML = f"<style>{_minify_css(CSS_STYLES)}</style>"
+SCRIPT_HTML = _minify_js(JAVASCRIPT_CODE)
+
+# HTML templates for the wish cards, filled via str.format_map
+_IMG_TMPL = "<img src='/file={p}' style='width:{width}px; border-radius:5px; margin-right:5px;' />"
+
+_MY_WISH_TMPL = """
+        <div style='border: 1px solid #ddd; padding: 15px; margin: 10px 0; border-radius: 8px; background-color: #fff;'>
+            <h3>{wish_name} {status}</h3>
+            <p><b>Beschreibung:</b> {description}</p>
+            {images_html}
+            <div style='margin-top: 10px; display: flex; gap: 10px;'>
+                <button onclick='editWish("{id}")'>✏️ Bearbeiten</button>
+                <button onclick='deleteWish("{id}")'>🗑️ Löschen</button>
+            </div>
+        </div>
+        """
+
+_OTHER_WISH_TMPL = """
+            <div id='wish-{id}' style='border: 1px solid #ddd; padding: 15px; margin: 10px 0; border-radius: 8px;'>
+                <h3>{wish_name}</h3>
+                <p><b>Beschreibung:</b> {description}</p>
+                 {images_html}
+                <div style='margin-top: 10px;'>{claim_html}</div>
+            </div>
+            """
+
+_CLAIMED_TODO_TMPL = """
+        <div style='background-color: #fff8f0; border:1px solid #ddd; padding:15px; margin:10px 0; border-radius:8px;'>
+            <h4>{wish_name} (für {owner_user})</h4>
+            <button onclick='markPurchased("{id}")'>✓ Als gekauft markieren</button>
+        </div>"""
+
+_CLAIMED_DONE_TMPL = """
+        <div style='background-color: #f0fff4; border:1px solid #51cf66; padding:15px; margin:10px 0; border-radius:8px;'>
+            <h4>{wish_name} (für {owner_user})</h4>
+            <p style='color:#51cf66; font-weight:bold;'>✅ Gekauft</p>
+            <button onclick='markUnpurchased("{id}")'>↶ Rückgängig machen</button>
+        </div>"""
+
 # 3. Backend Logic Functions
 # ========================
 
+# Wish store with lookup indexes
+def _escape_wish(wish: Dict[str, Any]):
+    """Stores HTML-escaped copies of the user-provided fields under `_*_html` keys."""
+    wish["_name_html"] = html.escape(wish["wish_name"])
+    wish["_desc_html"] = html.escape(wish.get("description", ""))
+    # Wishes saved by the Streamlit app hold inline {"data", "type"} dicts instead of file paths;
+    # there is no file to serve for those, so they are left out of the image strip
+    wish["_images_html"] = [html.escape(p) for p in wish.get("thumbnails") or wish.get("images") or [] if isinstance(p, str)]
+
+def _persisted(wish: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns the wish without the derived `_` fields, as written to disk."""
+    return {k: v for k, v in wish.items() if not k.startswith("_")}
+
+class WishStore:
+    """Holds the wish list together with indexes by wish id and by owner."""
+
+    def __init__(self, wishes: Optional[List[Dict[str, Any]]] = None):
+        self.wishes: List[Dict[str, Any]] = wishes if wishes is not None else []
+        for wish in self.wishes:
+            _escape_wish(wish)
+        self.reindex()
+
+    def reindex(self):
+        """Rebuilds both indexes from the wish list."""
+        self.by_id: Dict[str, Dict[str, Any]] = {w["id"]: w for w in self.wishes}
+        self.by_owner: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for wish in self.wishes:
+            self.by_owner[wish.get("owner_user")].append(wish)
+
+    def add(self, wish: Dict[str, Any]):
+        """Appends a wish and registers it in both indexes."""
+        _escape_wish(wish)
+        self.wishes.append(wish)
+        self.by_id[wish["id"]] = wish
+        self.by_owner[wish.get("owner_user")].append(wish)
+
+    def remove(self, wish: Dict[str, Any]):
+        """Removes a wish from the list and both indexes without rebuilding them."""
+        del self.by_id[wish["id"]]
+        self.wishes.remove(wish)
+        self.by_owner[wish.get("owner_user")].remove(wish)
+
+    def update(self, wish: Dict[str, Any], fields: Dict[str, Any]):
+        """Applies changed fields to a wish and refreshes its escaped copies."""
+        wish.update(fields)
+        _escape_wish(wish)
+
+    def get_owned(self, wish_id: str, owner: str) -> Optional[Dict[str, Any]]:
+        """Returns the wish with the given id if it belongs to owner."""
+        wish = self.by_id.get(wish_id)
+        return wish if wish is not None and wish.get("owner_user") == owner else None
+
 # Helper functions for data persistence
-def load_data() -> List[Dict[str, Any]]:
-    """Loads the wish list data from the JSON file."""
-    if not DATA_FILE.exists():
-        with open(DATA_FILE, "w") as f:
-            json.dump([], f)
-        return []
-    try:
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
+
+# Parsed contents of DATA_FILE + LOG_FILE, keyed by their stat stamp so unchanged files are not re-parsed
+_cache: Dict[str, Any] = {"stamp": None, "data": None}
+
+# Serializes file and cache access between Gradio worker threads and the flusher
+# Rendered views per (user, data stamp, view); dropped on every write
+_render_cache: Dict[Tuple, Any] = {}
+_lock = threading.RLock()
+_compact_requested = threading.Event()
+_flusher: Optional[threading.Thread] = None
+
+def _file_stamp(path: Path) -> Optional[Tuple[int, int]]:
+    """Returns (mtime, size) of a file, or None if it does not exist."""
+    if not path.exists():
+        return None
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+def _data_stamp() -> Tuple:
+    """Returns the combined stamp of the snapshot and the journal."""
+    return _file_stamp(DATA_FILE), _file_stamp(LOG_FILE)
+
+def _apply_event(store: WishStore, event: Dict[str, Any]):
+    """Applies a single journal event to the store."""
+    if event["op"] == "add":
+        store.add(event["wish"])
+    elif event["op"] == "update":
+        wish = store.by_id.get(event["id"])
+        if wish is not None:
+            store.update(wish, event["fields"])
+    elif event["op"] == "delete":
+        wish = store.by_id.get(event["id"])
+        if wish is not None:
+            store.remove(wish)
+
+def load_data() -> WishStore:
+    """Loads the wish list snapshot from the JSON file and replays the journal on top."""
+    with _lock:
+        if not DATA_FILE.exists():
+            DATA_FILE.write_bytes(b"[]")
+        stamp = _data_stamp()
+        if stamp == _cache["stamp"]:
+            return copy.deepcopy(_cache["data"])
+        try:
             # Handle empty file case
-            content = f.read()
-            if not content:
-                return []
-            return json.loads(content)
-    except (json.JSONDecodeError, FileNotFoundError):
-        return []
-
-def save_data(data: List[Dict[str, Any]]):
-    """Saves the wish list data to the JSON file."""
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+            content = DATA_FILE.read_bytes()
+            store = WishStore(orjson.loads(content) if content else [])
+        except (orjson.JSONDecodeError, FileNotFoundError):
+            return WishStore()
+        if LOG_FILE.exists():
+            for line in LOG_FILE.read_bytes().splitlines():
+                try:
+                    _apply_event(store, orjson.loads(line))
+                except orjson.JSONDecodeError:
+                    continue  # Torn line from an interrupted write; later events are still valid
+        _cache.update(stamp=stamp, data=store)
+        return copy.deepcopy(store)
+
+def save_data(store: WishStore):
+    """Writes a full snapshot to the JSON file and clears the journal."""
+    with _lock:
+        # Write to a sibling file and swap it in, so a crash never leaves a half-written snapshot
+        tmp = DATA_FILE.with_suffix(".json.tmp")
+        tmp.write_bytes(orjson.dumps([_persisted(w) for w in store.wishes], option=orjson.OPT_NON_STR_KEYS))
+        os.replace(tmp, DATA_FILE)
+        LOG_FILE.unlink(missing_ok=True)
+        _render_cache.clear()
+        _cache.update(stamp=_data_stamp(), data=copy.deepcopy(store))
+
+def compact():
+    """Folds the journal into a fresh snapshot."""
+    with _lock:
+        save_data(load_data())
+
+def _flush_loop():
+    """Background loop: waits for a compaction request, lets the burst settle, then compacts."""
+    while True:
+        _compact_requested.wait()
+        time.sleep(FLUSH_DELAY)
+        _compact_requested.clear()
+        compact()
+
+def start_flusher():
+    """Folds any journal left over from a crash, starts the background compaction thread
+    and flushes once more at interpreter exit."""
+    global _flusher
+    if LOG_FILE.exists():
+        compact()
+    _flusher = threading.Thread(target=_flush_loop, name="wishlist-flusher", daemon=True)
+    _flusher.start()
+    atexit.register(compact)
+
+def append_event(event: Dict[str, Any]):
+    """Records one mutation as a line in the journal instead of rewriting the whole file."""
+    if "wish" in event:
+        event = {**event, "wish": _persisted(event["wish"])}
+    with _lock:
+        in_sync = _cache["stamp"] == _data_stamp()
+        with open(LOG_FILE, "ab+") as f:
+            # An interrupted write can leave an unterminated last line; start on a fresh
+            # line so this event is not glued onto the fragment
+            if f.seek(0, os.SEEK_END):
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+            f.write(orjson.dumps(event) + b"\n")
+        _render_cache.clear()
+        if in_sync:
+            _apply_event(_cache["data"], copy.deepcopy(event))
+            _cache["stamp"] = _data_stamp()
+    # DATA_FILE is shared with readers that don't replay the journal, so every burst is
+    # compacted: off the request thread (after FLUSH_DELAY) when the flusher is running,
+    # right away otherwise
+    if _flusher is not None:
+        _compact_requested.set()
+    else:
+        compact()
+
+# Image helpers
+def _make_thumb(path: str) -> str:
+    """Writes a small JPEG preview next to an uploaded image and returns its path."""
+    try:
+        with Image.open(path) as img:
+            img.thumbnail(THUMBNAIL_SIZE)
+            out = Path(path).with_suffix(".thumb.jpg")
+            img.convert("RGB").save(out, "JPEG", quality=80)
+        return str(out)
+    except OSError:
+        # Not a readable image - fall back to the original file
+        return path
 
 # User and UI functions
+def check_credentials(username: str, password: str) -> bool:
+    """Gradio auth callback: checks a login against the prehashed passwords."""
+    expected = PASSWORD_HASHES.get(username)
+    return expected is not None and hmac.compare_digest(expected, hashlib.sha256(password.encode()).digest())
+
 def get_other_users(request: gr.Request) -> List[str]:
     """Returns a list of all users except the current one."""
-    current_user = request.username
-    return [user for user in ALL_USERS if user != current_user]
+    return list(_OTHERS_BY_USER[request.username])
 
 # Wish manipulation functions
 def add_wish(state, name, link, desc, note, color, buy_option, images, responsible_person, request: gr.Request):
@@ -220,16 +503,17 @@ def add_wish(state, name, link, desc, note, color, buy_option, images, responsib
     if is_for_others and not images:
         raise gr.Error("Bitte lade Bilder hoch, damit andere wissen, was sie kaufen sollen.")
 
+    image_paths = [str(p) for p in images] if images else []
     new_wish = {
-        "id": str(uuid.uuid4()), "owner_user": current_user, "wish_name": name,
+        "id": secrets.token_hex(16), "owner_user": current_user, "wish_name": name,
         "link": link, "description": desc, "note": note, "color": color,
         "buy_self": not is_for_others, "others_can_buy": is_for_others,
-        "images": [str(p) for p in images] if images else [],
+        "images": image_paths, "thumbnails": [_make_thumb(p) for p in image_paths],
         "responsible_person": responsible_person, "claimed_by": None,
         "claimed_at": None, "purchased": False,
     }
-    state.append(new_wish)
-    save_data(state)
+    state.add(new_wish)
+    append_event({"op": "add", "wish": new_wish})
     gr.Info(f"Wunsch '{name}' hinzugefügt!")
     return state, render_my_wishlist(state, request)
 
@@ -238,152 +522,147 @@ def update_wish(wish_id, state, name, link, desc, note, color, buy_option, image
     current_user = request.username
     is_for_others = buy_option == "Andere dürfen es kaufen"
     
-    for wish in state:
-        if wish["id"] == wish_id and wish["owner_user"] == current_user:
-            wish.update({
-                "wish_name": name, "link": link, "description": desc, "note": note,
-                "color": color, "buy_self": not is_for_others, "others_can_buy": is_for_others,
-                "responsible_person": responsible_person
-            })
-            if images: wish["images"] = [str(p) for p in images]
-            break
+    wish = state.get_owned(wish_id, current_user)
+    if wish is not None:
+        fields = {
+            "wish_name": name, "link": link, "description": desc, "note": note,
+            "color": color, "buy_self": not is_for_others, "others_can_buy": is_for_others,
+            "responsible_person": responsible_person
+        }
+        if images:
+            fields["images"] = [str(p) for p in images]
+            fields["thumbnails"] = [_make_thumb(p) for p in fields["images"]]
+        # Only journal what actually changed; an unchanged save writes nothing
+        changed = {k: v for k, v in fields.items() if wish.get(k) != v}
+        if changed:
+            state.update(wish, changed)
+            append_event({"op": "update", "id": wish_id, "fields": changed})
     
-    save_data(state)
     gr.Info(f"Wunsch '{name}' aktualisiert!")
     return state, render_my_wishlist(state, request)
 
 def delete_wish(wish_id, state, request: gr.Request):
     """Deletes a wish from the list."""
     current_user = request.username
-    original_len = len(state)
-    state[:] = [w for w in state if not (w["id"] == wish_id and w["owner_user"] == current_user)]
-    if len(state) < original_len:
-        save_data(state)
+    wish = state.get_owned(wish_id, current_user)
+    if wish is not None:
+        state.remove(wish)
+        append_event({"op": "delete", "id": wish_id})
         gr.Info("Wunsch gelöscht!")
     return state, render_my_wishlist(state, request)
 
 def get_wish_data(wish_id, state, request: gr.Request):
     """Gets the data for a specific wish to populate the edit form."""
-    for wish in state:
-        if wish["id"] == wish_id and wish["owner_user"] == request.username:
-            return (
-                gr.update(value=wish["wish_name"]), gr.update(value=wish["link"]),
-                gr.update(value=wish["description"]), gr.update(value=wish["note"]),
-                gr.update(value=wish["color"]),
-                gr.update(value="Ich kaufe es selbst" if wish["buy_self"] else "Andere dürfen es kaufen"),
-                gr.update(value=wish.get("responsible_person")),
-                gr.update(value=wish["id"]), # Set the current_edit_wish_id
-                gr.update(value="Wunsch speichern", variant="secondary") # Change button text
-            )
+    wish = state.get_owned(wish_id, request.username)
+    if wish is not None:
+        return (
+            gr.update(value=wish["wish_name"]), gr.update(value=wish["link"]),
+            gr.update(value=wish["description"]), gr.update(value=wish["note"]),
+            gr.update(value=wish["color"]),
+            gr.update(value="Ich kaufe es selbst" if wish["buy_self"] else "Andere dürfen es kaufen"),
+            gr.update(value=wish.get("responsible_person")),
+            gr.update(value=wish["id"]), # Set the current_edit_wish_id
+            gr.update(value="Wunsch speichern", variant="secondary") # Change button text
+        )
     return gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(value=""), gr.update(value="Wunsch hinzufügen", variant="primary")
 
 def claim_wish(wish_id, state, request: gr.Request):
     """Claims a wish for the current user."""
     current_user = request.username
-    for wish in state:
-        if wish["id"] == wish_id and wish["claimed_by"] is None:
-            wish["claimed_by"] = current_user
-            wish["claimed_at"] = datetime.datetime.now().isoformat()
-            save_data(state)
-            gr.Info(f"Du hast '{wish['wish_name']}' für {wish['owner_user']} reserviert!")
-            break
+    wish = state.by_id.get(wish_id)
+    if wish is not None and wish["claimed_by"] is None:
+        fields = {"claimed_by": current_user, "claimed_at": datetime.datetime.now().isoformat()}
+        state.update(wish, fields)
+        append_event({"op": "update", "id": wish_id, "fields": fields})
+        gr.Info(f"Du hast '{wish['wish_name']}' für {wish['owner_user']} reserviert!")
     return state
 
 def mark_as_purchased(wish_id, state, request: gr.Request):
     """Marks a wish as purchased."""
-    for wish in state:
-        if wish["id"] == wish_id and wish["claimed_by"] == request.username:
-            wish["purchased"] = True
-            save_data(state)
-            gr.Info(f"'{wish['wish_name']}' als gekauft markiert.")
-            break
+    wish = state.by_id.get(wish_id)
+    if wish is not None and wish["claimed_by"] == request.username:
+        wish["purchased"] = True
+        append_event({"op": "update", "id": wish_id, "fields": {"purchased": True}})
+        gr.Info(f"'{wish['wish_name']}' als gekauft markiert.")
     return state, render_my_claimed_items(state, request)
 
 def mark_as_unpurchased(wish_id, state, request: gr.Request):
     """Marks a wish as not purchased (undo)."""
-    for wish in state:
-        if wish["id"] == wish_id and wish["claimed_by"] == request.username:
-            wish["purchased"] = False
-            save_data(state)
-            break
+    wish = state.by_id.get(wish_id)
+    if wish is not None and wish["claimed_by"] == request.username:
+        wish["purchased"] = False
+        append_event({"op": "update", "id": wish_id, "fields": {"purchased": False}})
     return state, render_my_claimed_items(state, request)
 
 # HTML Rendering functions
+def _card_fields(wish: Dict[str, Any]) -> Dict[str, str]:
+    """Returns the pre-escaped fields shared by all wish card templates."""
+    return {
+        "id": wish["id"],
+        "wish_name": wish["_name_html"],
+        "description": wish["_desc_html"],
+        # Streamlit gift suggestions have no owner, only the person they are meant for
+        "owner_user": wish.get("owner_user") or wish.get("suggested_for", ""),
+    }
+
+def _images_html(paths: List[str], width: int) -> str:
+    """Renders the image strip of a wish card, or nothing if there are no images."""
+    if not paths:
+        return ""
+    return "<p><b>Bilder:</b></p>" + "".join(_IMG_TMPL.format(p=p, width=width) for p in paths)
+
 def render_my_wishlist(data, request: gr.Request) -> gr.HTML:
     """Renders the wish list for the currently logged-in user with edit/delete buttons."""
-    my_wishes = [w for w in data if w["owner_user"] == request.username]
+    my_wishes = data.by_owner.get(request.username, [])
     if not my_wishes:
         return gr.HTML("<p style='text-align:center; color:#666;'>Du hast noch keine Wünsche hinzugefügt.</p>")
     
-    html = "<div>"
-    for wish in my_wishes:
-        status = "🎁 <strong>Wird besorgt!</strong>" if wish["claimed_by"] else "🛍️ <em>Kaufe ich selbst</em>" if wish["buy_self"] else ""
-        html += f"""
-        <div style='border: 1px solid #ddd; padding: 15px; margin: 10px 0; border-radius: 8px; background-color: #fff;'>
-            <h3>{wish['wish_name']} {status}</h3>
-            <p><b>Beschreibung:</b> {wish['description']}</p>
-            {'<p><b>Bilder:</b></p>' + ''.join([f"<img src='/file={p}' style='width:100px; border-radius:5px; margin-right:5px;' />" for p in wish['images']]) if wish['images'] else ''}
-            <div style='margin-top: 10px; display: flex; gap: 10px;'>
-                <button onclick='editWish("{wish['id']}")'>✏️ Bearbeiten</button>
-                <button onclick='deleteWish("{wish['id']}")'>🗑️ Löschen</button>
-            </div>
-        </div>
-        """
-    html += "</div>"
-    return gr.HTML(html)
+    cards = (
+        _MY_WISH_TMPL.format_map({
+            **_card_fields(wish),
+            "status": "🎁 <strong>Wird besorgt!</strong>" if wish["claimed_by"] else "🛍️ <em>Kaufe ich selbst</em>" if wish["buy_self"] else "",
+            "images_html": _images_html(wish["_images_html"], 100),
+        })
+        for wish in my_wishes
+    )
+    return gr.HTML("<div>" + "".join(cards) + "</div>")
+
+def render_other_wish_card(wish: Dict[str, Any], current_user: str) -> str:
+    """Renders one card of the others' wishlists, with a claim button or its claim status."""
+    claim_html = f"<button onclick='claimWish(\"{wish['id']}\")'>Ich besorge das!</button>"
+    if wish["claimed_by"] == current_user:
+        claim_html = "<p style='color: green; font-weight: bold;'>✅ Du besorgst das.</p>"
+    elif wish["claimed_by"]:
+        claim_html = f"<p style='color: #666;'>🎁 Wird bereits von {wish['claimed_by']} besorgt.</p>"
+    
+    return _OTHER_WISH_TMPL.format_map({
+        **_card_fields(wish),
+        "images_html": _images_html(wish["_images_html"], 150),
+        "claim_html": claim_html,
+    })
 
 def render_others_wishlist_with_claim_buttons(state, request: gr.Request) -> gr.HTML:
     """Renders all other users' wishlists with claim buttons."""
-    other_wishes = [w for w in state if w["owner_user"] != request.username and w["others_can_buy"]]
-    if not other_wishes:
-        return gr.HTML("<p style='text-align:center; color:#666;'>Es gibt derzeit keine Wünsche von anderen.</p>")
-    
-    wishes_by_owner = {}
-    for wish in other_wishes:
-        owner = wish["owner_user"]
-        if owner not in wishes_by_owner:
-            wishes_by_owner[owner] = []
-        wishes_by_owner[owner].append(wish)
-    
-    html = ""
-    for owner, wishes in wishes_by_owner.items():
+    # The store is already grouped by owner, so only the "others can buy" filter is left per owner
+    parts = []
+    for owner, owned in state.by_owner.items():
+        if owner == request.username: continue
+        wishes = [w for w in owned if w.get("others_can_buy")]
         if not wishes: continue
-        html += f"<h2>🎁 Wünsche von {owner}</h2>"
-        for wish in wishes:
-            claim_html = f"<button onclick='claimWish(\"{wish['id']}\")'>Ich besorge das!</button>"
-            if wish["claimed_by"] == request.username:
-                claim_html = "<p style='color: green; font-weight: bold;'>✅ Du besorgst das.</p>"
-            elif wish["claimed_by"]:
-                claim_html = f"<p style='color: #666;'>🎁 Wird bereits von {wish['claimed_by']} besorgt.</p>"
-            
-            html += f"""
-            <div style='border: 1px solid #ddd; padding: 15px; margin: 10px 0; border-radius: 8px;'>
-                <h3>{wish['wish_name']}</h3>
-                <p><b>Beschreibung:</b> {wish['description']}</p>
-                 {'<p><b>Bilder:</b></p>' + ''.join([f"<img src='/file={p}' style='width:150px; border-radius:5px; margin-right:5px;' />" for p in wish['images']]) if wish['images'] else ''}
-                <div style='margin-top: 10px;'>{claim_html}</div>
-            </div>
-            """
-    return gr.HTML(html)
+        parts.append(f"<h2>🎁 Wünsche von {owner}</h2>")
+        parts.extend(render_other_wish_card(wish, request.username) for wish in wishes)
+    if not parts:
+        return gr.HTML("<p style='text-align:center; color:#666;'>Es gibt derzeit keine Wünsche von anderen.</p>")
+    return gr.HTML("".join(parts))
 
 def render_my_claimed_items(data, request: gr.Request) -> gr.HTML:
     """Renders items the current user has claimed."""
-    claimed_items = [w for w in data if w.get("claimed_by") == request.username]
+    claimed_items = [w for w in data.wishes if w.get("claimed_by") == request.username]
     if not claimed_items:
         return gr.HTML("<p style='text-align:center; color:#666;'>Du hast noch keine Geschenke reserviert.</p>")
         
-    to_buy_html = "".join([f"""
-        <div style='background-color: #fff8f0; border:1px solid #ddd; padding:15px; margin:10px 0; border-radius:8px;'>
-            <h4>{item['wish_name']} (für {item['owner_user']})</h4>
-            <button onclick='markPurchased("{item['id']}")'>✓ Als gekauft markieren</button>
-        </div>""" for item in claimed_items if not item.get("purchased")])
-        
-    bought_html = "".join([f"""
-        <div style='background-color: #f0fff4; border:1px solid #51cf66; padding:15px; margin:10px 0; border-radius:8px;'>
-            <h4>{item['wish_name']} (für {item['owner_user']})</h4>
-            <p style='color:#51cf66; font-weight:bold;'>✅ Gekauft</p>
-            <button onclick='markUnpurchased("{item['id']}")'>↶ Rückgängig machen</button>
-        </div>""" for item in claimed_items if item.get("purchased")])
+    to_buy_html = "".join(_CLAIMED_TODO_TMPL.format_map(_card_fields(item)) for item in claimed_items if not item.get("purchased"))
+    bought_html = "".join(_CLAIMED_DONE_TMPL.format_map(_card_fields(item)) for item in claimed_items if item.get("purchased"))
 
     return gr.HTML(f"""
         <h2>📋 Meine Besorgungen</h2>
@@ -398,6 +677,17 @@ def render_my_expert_assignments(data, request: gr.Request) -> gr.Markdown:
      # This can remain as Markdown if preferred
     return gr.Markdown("Experten-Ansicht wird geladen...")
 
+def load_view(render_fn, request: gr.Request) -> Tuple[WishStore, Any]:
+    """Loads the current data and renders one view, reusing the cached render while the data is unchanged."""
+    with _lock:
+        stamp = _data_stamp()
+        state = load_data()
+    key = (request.username, stamp, render_fn.__name__)
+    view = _render_cache.get(key)
+    if view is None:
+        view = _render_cache[key] = render_fn(state, request)
+    return state, view
+
 
 # 4. UI Layout (Gradio Blocks)
 # ============================
@@ -406,8 +696,8 @@ with gr.Blocks(title="Gemeinsame Weihnachts-Wunschliste", theme="soft") as demo:
     app_state = gr.State(value=load_data())
 
     # Injiziere CSS, JS und das Schnee-Canvas - JS MUSS ZUERST kommen!
-    gr.HTML(JAVASCRIPT_CODE)
-    gr.HTML(f"<style>{CSS_STYLES}</style>")
+    gr.HTML(SCRIPT_HTML)
+    gr.HTML(STYLES_HTML)
     gr.HTML("<canvas class='snow'></canvas>")
 
     # --- Hidden Components for Triggers ---
@@ -422,12 +712,14 @@ with gr.Blocks(title="Gemeinsame Weihnachts-Wunschliste", theme="soft") as demo:
         delete_wish_id_input = gr.Textbox(label="delete_wish_id")
         delete_trigger_btn = gr.Button("delete_trigger")
         current_edit_wish_id = gr.Textbox(label="current_edit_id")
+        card_patch = gr.JSON(label="card_patch")
 
     # --- UI Structure ---
     gr.Markdown("# 🎄 Gemeinsame Weihnachts-Wunschliste 🎄", elem_id="main-title")
     
-    with gr.Row():
-        with gr.Column(scale=1):
+    # Each tab renders its view only when it is opened
+    with gr.Tabs():
+        with gr.Tab("📝 Meine Wünsche") as my_wishes_tab:
             with gr.Group():
                 gr.Markdown("## 📝 Meine Wunschliste")
                 with gr.Accordion("Neuen Wunsch hinzufügen / Bearbeiten", open=True) as form_accordion:
@@ -443,13 +735,16 @@ with gr.Blocks(title="Gemeinsame Weihnachts-Wunschliste", theme="soft") as demo:
                 
                 my_wishlist_display = gr.HTML("Lade deine Wünsche...")
 
-            with gr.Group():
-                 my_claimed_items_display = gr.HTML("Lade deine Besorgungen...")
-
-        with gr.Column(scale=1):
+        with gr.Tab("🎁 Andere") as others_tab:
             with gr.Group():
                 gr.Markdown("## 🎁 Wunschlisten der Anderen")
                 others_wishlist_display = gr.HTML("Lade Wunschlisten...")
+
+        with gr.Tab("🛒 Besorgungen") as claimed_tab:
+            with gr.Group():
+                 my_claimed_items_display = gr.HTML("Lade deine Besorgungen...")
+
+        with gr.Tab("👨‍🏫 Experte") as expert_tab:
             with gr.Group():
                 gr.Markdown("## 👨‍🏫 Meine Expertenaufträge")
                 my_expert_assignments_display = gr.Markdown("Lade deine Expertenaufträge...")
@@ -457,24 +752,28 @@ with gr.Blocks(title="Gemeinsame Weihnachts-Wunschliste", theme="soft") as demo:
     # 5. Event Logic
     # ==============
     def on_load(request: gr.Request):
-        # Lade die Daten bei jedem Neuladen der Seite frisch.
-        state = load_data()
+        # Lade die Daten bei jedem Neuladen der Seite frisch; nur der Start-Tab wird gerendert.
+        state, my_view = load_view(render_my_wishlist, request)
         other_users = get_other_users(request)
-        return (
-            state,
-            render_my_wishlist(state, request),
-            render_others_wishlist_with_claim_buttons(state, request),
-            render_my_claimed_items(state, request),
-            render_my_expert_assignments(state, request),
-            gr.update(choices=other_users),
-        )
+        return state, my_view, gr.update(choices=other_users)
 
     demo.load(
         on_load,
         inputs=None, # Läuft beim Laden der Seite
-        outputs=[app_state, my_wishlist_display, others_wishlist_display, my_claimed_items_display, my_expert_assignments_display, other_users_dd_add]
+        outputs=[app_state, my_wishlist_display, other_users_dd_add]
     )
 
+    def tab_loader(render_fn):
+        """Builds a tab select handler that loads the data and renders one view."""
+        def load_tab(request: gr.Request):
+            return load_view(render_fn, request)
+        return load_tab
+
+    my_wishes_tab.select(tab_loader(render_my_wishlist), None, [app_state, my_wishlist_display])
+    others_tab.select(tab_loader(render_others_wishlist_with_claim_buttons), None, [app_state, others_wishlist_display])
+    claimed_tab.select(tab_loader(render_my_claimed_items), None, [app_state, my_claimed_items_display])
+    expert_tab.select(tab_loader(render_my_expert_assignments), None, [app_state, my_expert_assignments_display])
+
     def handle_add_or_update(state, name, link, desc, note, color, buy_option, images, responsible_person, edit_id, request: gr.Request):
         if edit_id: # If an ID is present, we are updating
             new_state, updated_view = update_wish(edit_id, state, name, link, desc, note, color, buy_option, images, responsible_person, request)
@@ -504,19 +803,33 @@ with gr.Blocks(title="Gemeinsame Weihnachts-Wunschliste", theme="soft") as demo:
 
     def handle_claim_and_refresh(wish_id, state, request: gr.Request):
         new_state = claim_wish(wish_id, state, request)
-        return new_state, render_others_wishlist_with_claim_buttons(new_state, request), render_my_claimed_items(new_state, request)
+        # Only the claimed card changes in the others' list, so ship just that card
+        wish = new_state.by_id.get(wish_id)
+        patch = {"id": wish_id, "html": render_other_wish_card(wish, request.username)} if wish else None
+        return new_state, patch, render_my_claimed_items(new_state, request)
 
     claim_wish_trigger_btn.click(
         handle_claim_and_refresh,
         [claim_wish_id_input, app_state],
-        [app_state, others_wishlist_display, my_claimed_items_display]
+        [app_state, card_patch, my_claimed_items_display]
+    ).then(None, [card_patch], None, js="(patch) => { updateCard(patch); }")
+
+    def handle_mark(wish_id, state, evt: gr.EventData, request: gr.Request):
+        # Both toggle buttons share one event; the trigger tells which way to flip
+        if evt.target is mark_purchased_trigger_btn:
+            return mark_as_purchased(wish_id, state, request)
+        return mark_as_unpurchased(wish_id, state, request)
+
+    gr.on(
+        triggers=[mark_purchased_trigger_btn.click, mark_unpurchased_trigger_btn.click],
+        fn=handle_mark,
+        inputs=[mark_purchased_id_input, app_state],
+        outputs=[app_state, my_claimed_items_display]
     )
 
-    mark_purchased_trigger_btn.click(mark_as_purchased, [mark_purchased_id_input, app_state], [app_state, my_claimed_items_display])
-    mark_unpurchased_trigger_btn.click(mark_as_unpurchased, [mark_purchased_id_input, app_state], [app_state, my_claimed_items_display])
-
 
 # 6. Launch the App
 # =================
 if __name__ == "__main__":
-    demo.launch(auth=list(USER_CREDENTIALS.items()))
\ No newline at end of file
+    start_flusher()
+    demo.launch(auth=check_credentials)
\ No newline at end of file
@@ -4,22 +4,38 @@ A beautiful, festive, multi-user Christmas wishlist app.
 """
 
 import streamlit as st
+import hashlib
+import hmac
+import importlib.util
 import json
-import uuid
+import os
+import random
+import secrets
+import threading
 import datetime
-import base64
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from io import BytesIO
 from PIL import Image
 
-# Firebase imports (optional, only used if configured)
+# Firebase (optional, only used if configured). Only check that it is installed here;
+# the heavy import happens in _init_firebase_from_secrets once secrets ask for it.
+FIREBASE_AVAILABLE = importlib.util.find_spec("firebase_admin") is not None
+
+# Faster JSON (optional, falls back to the standard library)
 try:
-    import firebase_admin  # type: ignore
-    from firebase_admin import credentials, db  # type: ignore
-    FIREBASE_AVAILABLE = True
+    import orjson  # type: ignore
+    ORJSON_AVAILABLE = True
 except ImportError:
-    FIREBASE_AVAILABLE = False
+    ORJSON_AVAILABLE = False
+
+# SIMD base64 codec (optional, same API as the standard library module)
+try:
+    import pybase64 as base64  # type: ignore
+except ImportError:
+    import base64
 
 # --- Configuration ---
 USER_CREDENTIALS = {
@@ -27,19 +43,69 @@ USER_CREDENTIALS = {
     "Pia": "pia123", "Emmy": "emmy123", "Tim": "tim123"
 }
 ALL_USERS = list(USER_CREDENTIALS.keys())
+# Everyone except the given user, and the same with an empty "no expert" choice in front
+OTHER_USERS_BY_USER = {u: [x for x in ALL_USERS if x != u] for u in ALL_USERS}
+EXPERT_OPTIONS_BY_USER = {u: [""] + others for u, others in OTHER_USERS_BY_USER.items()}
 SUPER_USERS = ["Dieter", "Gudrun"]
 DATA_FILE = Path("wunschliste.json")
 BUDGET_LIMIT = 1500.0  # Budget limit per user in euros
+IMAGE_MAX_SIZE = 800  # Uploaded wish images are shrunk to fit this many pixels per side
+WISH_IMAGE_WIDTH = 200  # Display width of wish images on the cards
+DEBUG = False  # Pretty-print the local JSON file for manual inspection
 
 # --- Helper Functions ---
+def _hash_password(password: str, salt: bytes) -> bytes:
+    """Derive a scrypt hash of the password with the given salt."""
+    return hashlib.scrypt(password.encode(), salt=salt, n=2**14, r=8, p=1)
+
+
+@st.cache_resource
+def _password_hashes() -> Dict[str, Tuple[bytes, bytes]]:
+    """Salted password hashes per user, computed once per process."""
+    hashes = {}
+    for user, password in USER_CREDENTIALS.items():
+        salt = os.urandom(16)
+        hashes[user] = (salt, _hash_password(password, salt))
+    return hashes
+
+
+def check_password(username: str, password: str) -> bool:
+    """Check a login against the stored hash in constant time."""
+    entry = _password_hashes().get(username)
+    if entry is None:
+        return False
+    salt, expected = entry
+    return hmac.compare_digest(_hash_password(password, salt), expected)
+
+
 def navigate_to(page: str):
     """Navigate to a page and update URL for browser history support."""
     st.session_state['current_page'] = page
     st.query_params['page'] = page
     st.rerun()
 
+
 # --- Data Persistence (Firebase Realtime Database preferred, fallback to local JSON) ---
 
+@st.cache_resource(show_spinner=False)
+def _firebase_db() -> Optional[Any]:
+    """Process-wide Firebase database reference, or None when no `firebase` secret is set.
+    Connection errors propagate, so they are not cached and the next call retries.
+    """
+    if not st.secrets.get("firebase"):
+        return None
+
+    import firebase_admin  # type: ignore
+    from firebase_admin import credentials, db  # type: ignore
+    # Avoid re-initializing the app
+    if not firebase_admin._apps:
+        cred = credentials.Certificate(dict(st.secrets["firebase"]))
+        firebase_admin.initialize_app(cred, {
+            'databaseURL': f'https://{st.secrets["firebase"]["project_id"]}-default-rtdb.firebaseio.com'
+        })
+    return db.reference('/')
+
+
 def _init_firebase_from_secrets() -> Optional[Any]:
     """Initialize Firebase Realtime Database using service account provided in Streamlit secrets.
     Returns a database reference or None on failure.
@@ -49,28 +115,71 @@ def _init_firebase_from_secrets() -> Optional[Any]:
         return None
     
     try:
-        if not st.secrets.get("firebase"):
-            return None
-        if 'firebase_db' in st.session_state:
-            return st.session_state['firebase_db']
-        
-        cred = credentials.Certificate(dict(st.secrets["firebase"]))
-        # Avoid re-initializing the app
-        try:
-            firebase_admin.get_app()
-        except Exception:
-            firebase_admin.initialize_app(cred, {
-                'databaseURL': f'https://{st.secrets["firebase"]["project_id"]}-default-rtdb.firebaseio.com'
-            })
-        database = db.reference('/')
-        st.session_state['firebase_db'] = database
-        return database
+        return _firebase_db()
     except Exception as e:
         # Show error for debugging but don't crash
         st.sidebar.warning(f"Firebase connection failed: {str(e)}")
         return None
 
 
+def _read_json_file(path: Path) -> Any:
+    """Parse a JSON file straight from its bytes. Returns None for an empty file."""
+    with open(path, "rb") as f:
+        content = f.read()
+    if not content:
+        return None
+    return orjson.loads(content) if ORJSON_AVAILABLE else json.loads(content)
+
+
+def _dumps(data: Any, sort_keys: bool = False) -> bytes:
+    """Serialize to JSON bytes, with orjson when available."""
+    if ORJSON_AVAILABLE:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if DEBUG else 0) | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(data, option=option)
+    if DEBUG:
+        return json.dumps(data, indent=4, ensure_ascii=False, sort_keys=sort_keys).encode("utf-8")
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False, sort_keys=sort_keys).encode("utf-8")
+
+
+def _wish_digests(wishes: Dict[str, Dict[str, Any]]) -> Dict[str, bytes]:
+    """Content digest per wish id, used to send only changed wishes to Firebase."""
+    return {wish_id: hashlib.blake2b(_dumps(item, sort_keys=True), digest_size=16).digest() for wish_id, item in wishes.items()}
+
+
+@st.cache_resource
+def _write_lock() -> threading.RLock:
+    """Process-wide lock for local JSON writes (all sessions run as threads of one process).
+    Reentrant, so save_data can hold it across its re-read and the write.
+    """
+    return threading.RLock()
+
+
+@st.cache_resource
+def _written_digests() -> Dict[str, Tuple[bytes, int]]:
+    """Digest and mtime of the last content this process wrote, per file."""
+    return {}
+
+
+def _write_json_file(path: Path, data: Any) -> bool:
+    """Write JSON via a temp file, so readers never see a half-written file.
+    Skips the write when the file still holds exactly this content. Returns whether it wrote.
+    """
+    payload = _dumps(data)
+    digest = hashlib.blake2b(payload, digest_size=16).digest()
+    tmp = path.with_suffix('.json.tmp')
+    # Two sessions saving at once would otherwise write into the same temp file
+    with _write_lock():
+        written = _written_digests()
+        # The mtime check catches writes from outside this process
+        if path.exists() and written.get(str(path)) == (digest, path.stat().st_mtime_ns):
+            return False
+        with open(tmp, "wb") as f:
+            f.write(payload)
+        os.replace(tmp, path)
+        written[str(path)] = (digest, path.stat().st_mtime_ns)
+    return True
+
+
 def load_data() -> List[Dict[str, Any]]:
     """Load wishlist data. Prefer Firebase Realtime Database when configured, otherwise use local JSON file."""
     # Try Firebase Realtime Database
@@ -82,8 +191,11 @@ def load_data() -> List[Dict[str, Any]]:
             if data:
                 # Firebase returns a dict, convert to list
                 if isinstance(data, dict):
+                    # Remember what the remote holds, so save_data can send only the changes
+                    st.session_state['firebase_wish_digests'] = _wish_digests(data)
                     return list(data.values())
                 return data if isinstance(data, list) else []
+            st.session_state['firebase_wish_digests'] = {}
             return []
         except Exception as e:
             # fall back to local file
@@ -91,12 +203,20 @@ def load_data() -> List[Dict[str, Any]]:
             pass
 
     # Fallback: local JSON file
-    if not DATA_FILE.exists():
+    mtime_ns = DATA_FILE.stat().st_mtime_ns if DATA_FILE.exists() else 0
+    data = _load_local_data(mtime_ns)
+    # Remember what the file holds, so save_data can merge only this session's changes
+    st.session_state['local_wish_digests'] = _wish_digests({item['id']: item for item in data})
+    return data
+
+
+@st.cache_data(show_spinner=False)
+def _load_local_data(mtime_ns: int) -> List[Dict[str, Any]]:
+    """Parse the local JSON file. Cached per modification time, so all sessions share one parse."""
+    if not mtime_ns:
         return []
     try:
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            content = f.read()
-            return json.loads(content) if content else []
+        return _read_json_file(DATA_FILE) or []
     except (json.JSONDecodeError, FileNotFoundError):
         return []
 
@@ -111,10 +231,22 @@ def save_data(data: List[Dict[str, Any]]):
             # Convert list to dict with IDs as keys for better Firebase structure
             data_dict = {}
             for item in data:
-                item_id = item.get('id', str(uuid.uuid4()))
+                # Only generate an id for items that lack one
+                item_id = item.get('id') or secrets.token_hex(16)
                 data_dict[item_id] = item
-            # Set the entire wishes node
-            wishes_ref.set(data_dict)
+            digests = _wish_digests(data_dict)
+            previous = st.session_state.get('firebase_wish_digests')
+            if previous is None:
+                # Set the entire wishes node
+                wishes_ref.set(data_dict)
+            else:
+                # Send only added/changed wishes and delete removed ones, leaving
+                # wishes that other sessions changed meanwhile untouched
+                updates = {wish_id: item for wish_id, item in data_dict.items() if previous.get(wish_id) != digests[wish_id]}
+                updates.update({wish_id: None for wish_id in previous.keys() - digests.keys()})
+                if updates:
+                    wishes_ref.update(updates)
+            st.session_state['firebase_wish_digests'] = digests
             return
         except Exception as e:
             # fall back to local file
@@ -122,8 +254,60 @@ def save_data(data: List[Dict[str, Any]]):
             pass
 
     # Fallback: write to local JSON file
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+    with _write_lock():
+        merged = _merge_local_wishes(data)
+        if _write_json_file(DATA_FILE, merged):
+            _load_local_data.clear()
+
+
+def _merge_local_wishes(data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Re-read the local file and apply only the wishes this session added, changed or deleted,
+    so saves from other sessions since our last load/save are kept. Call with _write_lock() held.
+    Returns the list to write. Other sessions' changes are brought into `data` in place, keeping
+    the existing wish dicts, since fragments and the image cache hold references to them.
+    """
+    by_id = {item['id']: item for item in data}
+    digests = _wish_digests(by_id)
+    previous = st.session_state.get('local_wish_digests')
+    if previous is None or not DATA_FILE.exists():
+        st.session_state['local_wish_digests'] = digests
+        return data
+    try:
+        on_disk = _read_json_file(DATA_FILE) or []
+    except json.JSONDecodeError:
+        on_disk = []
+    disk_digests = _wish_digests({item['id']: item for item in on_disk})
+    changed = {wish_id for wish_id in by_id if previous.get(wish_id) != digests[wish_id]}
+    deleted = previous.keys() - by_id.keys()
+
+    merged = []
+    new_digests = {}
+    for disk_item in on_disk:
+        wish_id = disk_item['id']
+        if wish_id in deleted:
+            continue
+        wish = by_id.get(wish_id)
+        if wish is None:
+            # Added by another session
+            wish = disk_item
+            data.append(wish)
+        elif wish_id not in changed and disk_digests[wish_id] != digests[wish_id]:
+            # Changed by another session
+            wish.clear()
+            wish.update(disk_item)
+        merged.append(wish)
+        new_digests[wish_id] = digests[wish_id] if wish_id in changed else disk_digests[wish_id]
+    # Added by this session (or changed here after another session deleted it)
+    for wish in data:
+        if wish['id'] in changed and wish['id'] not in new_digests:
+            merged.append(wish)
+            new_digests[wish['id']] = digests[wish['id']]
+    # Deleted by another session and untouched here
+    for i in reversed(range(len(data))):
+        if data[i]['id'] not in new_digests:
+            del data[i]
+    st.session_state['local_wish_digests'] = new_digests
+    return merged
 
 
 def migrate_meal_data(data: Dict[str, Any]) -> Dict[str, Any]:
@@ -158,7 +342,7 @@ def migrate_meal_data(data: Dict[str, Any]) -> Dict[str, Any]:
                     
                     # If we haven't seen this dish yet, add it to proposals
                     if dish_name and dish_name not in seen_dishes:
-                        dish_id = str(uuid.uuid4())
+                        dish_id = secrets.token_hex(16)
                         new_dish = {
                             "id": dish_id,
                             "name": dish_name,
@@ -227,8 +411,8 @@ def load_planning_data() -> Dict[str, Any]:
     planning_file = Path("planning.json")
     if planning_file.exists():
         try:
-            with open(planning_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            data = _read_json_file(planning_file)
+            if data is not None:
                 # Migrate old data structure if needed
                 old_data = data.copy()
                 data = migrate_meal_data(data)
@@ -237,8 +421,7 @@ def load_planning_data() -> Dict[str, Any]:
                     data_migrated = True
                 if data_migrated:
                     # Save migrated data back to file
-                    with open(planning_file, "w", encoding="utf-8") as fw:
-                        json.dump(data, fw, indent=4, ensure_ascii=False)
+                    _write_json_file(planning_file, data)
                 return data
         except (json.JSONDecodeError, FileNotFoundError):
             pass
@@ -257,8 +440,7 @@ def save_planning_data(data: Dict[str, Any]):
             st.sidebar.warning(f"Firebase planning write failed: {str(e)}")
     
     # Fallback: local JSON
-    with open("planning.json", "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+    _write_json_file(Path("planning.json"), data)
 
 # --- Main App Logic ---
 def login_page():
@@ -272,7 +454,7 @@ def login_page():
         submitted = st.form_submit_button("Anmelden")
 
         if submitted:
-            if USER_CREDENTIALS.get(username) == password:
+            if check_password(username, password):
                 st.session_state["authenticated"] = True
                 st.session_state["username"] = username
                 st.rerun()
@@ -495,6 +677,91 @@ def countdown_page():
     st.write("Nutze die Wunschliste, um deine Geschenkwünsche zu teilen und die Planung für die Feiertage zu koordinieren.")
 
 
+def compress_upload(uploaded_file) -> Dict[str, str]:
+    """Shrink an uploaded image and re-encode it as a base64 JPEG image entry."""
+    # Open and compress the image
+    img = Image.open(uploaded_file)
+
+    # Shrink in place to fit the display box; for JPEGs this
+    # already downscales while decoding
+    img.thumbnail((IMAGE_MAX_SIZE, IMAGE_MAX_SIZE), Image.Resampling.LANCZOS)
+
+    # Convert to RGB if necessary
+    if img.mode in ('RGBA', 'LA', 'P'):
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        if img.mode == 'P':
+            img = img.convert('RGBA')
+        background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
+        img = background
+
+    # Save to bytes with compression
+    buffer = BytesIO()
+    img.save(buffer, format='JPEG', quality=85, optimize=True)
+
+    # Convert to base64 straight from the buffer's memory, without a bytes copy
+    base64_image = base64.b64encode(buffer.getbuffer()).decode("ascii")
+    return {"data": base64_image, "type": "image/jpeg"}
+
+
+def decoded_images(wish: Dict[str, Any]) -> List[bytes]:
+    """Decoded image bytes of a wish, cached per session until its images list is replaced."""
+    cache = st.session_state.setdefault('img_cache', {})
+    images = wish.get('images')
+    entry = cache.get(wish['id'])
+    if entry is None or entry[0] is not images:
+        decoded = []
+        if isinstance(images, list):
+            # Filter out non-dict items (old format compatibility)
+            for img in images:
+                if isinstance(img, dict) and 'data' in img:
+                    try:
+                        decoded.append(base64.b64decode(img['data'], validate=True))
+                    except ValueError:
+                        pass  # Silently skip if image decoding fails
+        entry = cache[wish['id']] = (images, decoded)
+    return entry[1]
+
+
+def render_card_text(*blocks: str):
+    """Display the static text of a card as one markdown element; empty blocks are skipped."""
+    st.markdown("\n\n".join(block for block in blocks if block))
+
+
+def render_wish_images(wish: Dict[str, Any]):
+    """Display the images of a wish side by side as a single image element."""
+    images = decoded_images(wish)
+    if images:
+        try:
+            st.image(images, width=WISH_IMAGE_WIDTH)
+        except Exception:
+            pass  # Silently skip images that cannot be displayed
+
+
+@st.dialog("🛍️ Als gekauft markieren")
+def purchase_dialog(item: Dict[str, Any], claim: bool = False):
+    """Ask for the actual price of a gift and mark it as purchased.
+    With claim=True (the owner buying a self-bought wish) the current user also becomes its buyer.
+    """
+    estimated_price = float(item.get("price") or 0.0)
+    st.write(f"**{item.get('wish_name', 'Unbekannt')}**")
+    st.write(f"💰 Geschätzter Preis: {estimated_price:.2f}€")
+    actual_price = st.number_input(
+        "Tatsächlicher Preis (€)",
+        min_value=0.0,
+        value=estimated_price,
+        format="%.2f"
+    )
+    if st.button("✓ Als gekauft markieren", type="primary"):
+        item['purchased'] = True
+        item['actual_price'] = actual_price
+        if claim:
+            item['claimed_by'] = st.session_state['username']
+        if 'reimbursed' not in item:
+            item['reimbursed'] = False
+        save_data(st.session_state['data'])
+        st.rerun()
+
+
 def wishlist_page():
     """Display the wishlist page."""
     
@@ -504,6 +771,29 @@ def wishlist_page():
     
     st.title("🎁 Wunschliste")
 
+    # Index wishes by id and sort them into the page sections in a single pass
+    username = st.session_state['username']
+    by_id = {}
+    my_wishes, my_claimed, my_expert_tasks = [], [], []
+    wishes_by_owner = defaultdict(list)
+    suggestions_by_person = defaultdict(list)
+    purchased_by_user = defaultdict(list)
+    for w in st.session_state['data']:
+        by_id[w['id']] = w
+        if w.get("owner_user") == username:
+            my_wishes.append(w)
+        elif w.get("others_can_buy"):
+            wishes_by_owner[w["owner_user"]].append(w)
+        if w.get("claimed_by") == username:
+            my_claimed.append(w)
+        if w.get("purchased") and w.get("claimed_by"):
+            purchased_by_user[w["claimed_by"]].append(w)
+        if w.get("responsible_person") == username:
+            my_expert_tasks.append(w)
+        if w.get("type") == "suggestion" and w.get("suggested_for") != username:
+            suggestions_by_person[w['suggested_for']].append(w)
+    purchased_items = purchased_by_user[username]
+
     # Define columns for layout
     col1, col2 = st.columns(2)
 
@@ -513,8 +803,9 @@ def wishlist_page():
         with st.expander("📝 Wunsch hinzufügen / Bearbeiten", expanded=True):
             
             edit_mode = st.session_state.edit_wish_id is not None
-            wish_to_edit = next((w for w in st.session_state.data if w['id'] == st.session_state.edit_wish_id), None) if edit_mode else None
-            is_suggestion = (wish_to_edit and wish_to_edit.get('type') == 'suggestion') if wish_to_edit else False
+            # Form defaults: the wish being edited, or nothing for a new wish
+            defaults = (by_id.get(st.session_state.edit_wish_id) if edit_mode else None) or {}
+            is_suggestion = defaults.get('type') == 'suggestion'
 
             with st.form("wish_form"):
                 if is_suggestion:
@@ -522,15 +813,15 @@ def wishlist_page():
                 else:
                     st.subheader("Neuen Wunsch hinzufügen" if not edit_mode else "Wunsch bearbeiten")
                 
-                if is_suggestion and wish_to_edit:
+                if is_suggestion:
                     # Editing a suggestion - show suggestion fields
-                    wish_name = st.text_input("Geschenkidee", value=wish_to_edit.get("wish_name", ""))
-                    wish_desc = st.text_area("Beschreibung / Warum ist das eine gute Idee?", value=wish_to_edit.get("description", ""))
-                    wish_link = st.text_input("Link (optional)", value=wish_to_edit.get("link", ""))
-                    wish_price = st.number_input("Ungefährer Preis (€)", min_value=0.0, value=wish_to_edit.get("price", 0.0), format="%.2f")
+                    wish_name = st.text_input("Geschenkidee", value=defaults.get("wish_name", ""))
+                    wish_desc = st.text_area("Beschreibung / Warum ist das eine gute Idee?", value=defaults.get("description", ""))
+                    wish_link = st.text_input("Link (optional)", value=defaults.get("link", ""))
+                    wish_price = st.number_input("Ungefährer Preis (€)", min_value=0.0, value=defaults.get("price", 0.0), format="%.2f")
                     
                     # Show who the suggestion is for
-                    st.info(f"Vorschlag für: {wish_to_edit.get('suggested_for', 'Unbekannt')}")
+                    st.info(f"Vorschlag für: {defaults.get('suggested_for', 'Unbekannt')}")
                     
                     # No image upload or buy options for suggestions
                     uploaded_images = None
@@ -538,10 +829,10 @@ def wishlist_page():
                     responsible_person = None
                 else:
                     # Regular wish form
-                    wish_name = st.text_input("Was wünschst du dir?", value=wish_to_edit.get("wish_name", "") if wish_to_edit else "")
-                    wish_desc = st.text_area("Beschreibung", value=wish_to_edit.get("description", "") if wish_to_edit else "")
-                    wish_link = st.text_input("Link (optional)", value=wish_to_edit.get("link", "") if wish_to_edit else "")
-                    wish_price = st.number_input("Preis (€)", min_value=0.0, value=wish_to_edit.get("price", 0.0) if wish_to_edit else 0.0, format="%.2f")
+                    wish_name = st.text_input("Was wünschst du dir?", value=defaults.get("wish_name", ""))
+                    wish_desc = st.text_area("Beschreibung", value=defaults.get("description", ""))
+                    wish_link = st.text_input("Link (optional)", value=defaults.get("link", ""))
+                    wish_price = st.number_input("Preis (€)", min_value=0.0, value=defaults.get("price", 0.0), format="%.2f")
                     
                     # Image upload
                     uploaded_images = st.file_uploader(
@@ -552,12 +843,11 @@ def wishlist_page():
                     )
                     
                     buy_options = ("Andere dürfen es kaufen", "Ich kaufe es selbst")
-                    buy_option_index = 1 if (wish_to_edit and wish_to_edit.get("buy_self")) else 0
+                    buy_option_index = 1 if defaults.get("buy_self") else 0
                     buy_option = st.radio("Wer soll es besorgen?", buy_options, index=buy_option_index, horizontal=True)
                     
-                    other_users = [user for user in ALL_USERS if user != st.session_state['username']]
-                    expert_options = [""] + other_users
-                    responsible = wish_to_edit.get("responsible_person") if wish_to_edit else None
+                    expert_options = EXPERT_OPTIONS_BY_USER[st.session_state['username']]
+                    responsible = defaults.get("responsible_person")
                     expert_index = expert_options.index(responsible) if responsible and responsible in expert_options else 0
                     responsible_person = st.selectbox("Experte (optional)", expert_options, index=expert_index)
 
@@ -581,8 +871,7 @@ def wishlist_page():
                     
                     # Check budget limit when adding new wish (not when editing)
                     if not edit_mode:
-                        current_wishes = [w for w in st.session_state['data'] if w.get("owner_user") == st.session_state['username']]
-                        current_total = sum(w.get("actual_price", 0.0) if w.get("purchased") else w.get("price", 0.0) for w in current_wishes)
+                        current_total = sum(w.get("actual_price", 0.0) if w.get("purchased") else w.get("price", 0.0) for w in my_wishes)
                         
                         if current_total + wish_price > BUDGET_LIMIT:
                             remaining = BUDGET_LIMIT - current_total
@@ -593,75 +882,52 @@ def wishlist_page():
                     image_data = []
                     if uploaded_images:
                         try:
-                            for uploaded_file in uploaded_images:
-                                # Open and compress the image
-                                img = Image.open(uploaded_file)
-                                
-                                # Resize if too large (max 800px width)
-                                max_width = 800
-                                if img.width > max_width:
-                                    ratio = max_width / img.width
-                                    new_height = int(img.height * ratio)
-                                    img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
-                                
-                                # Convert to RGB if necessary
-                                if img.mode in ('RGBA', 'LA', 'P'):
-                                    background = Image.new('RGB', img.size, (255, 255, 255))
-                                    if img.mode == 'P':
-                                        img = img.convert('RGBA')
-                                    background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                                    img = background
-                                
-                                # Save to bytes with compression
-                                buffer = BytesIO()
-                                img.save(buffer, format='JPEG', quality=85, optimize=True)
-                                buffer.seek(0)
-                                
-                                # Convert to base64
-                                base64_image = base64.b64encode(buffer.read()).decode()
-                                image_data.append({
-                                    "data": base64_image,
-                                    "type": "image/jpeg"
-                                })
+                            # Pillow releases the GIL while resizing and encoding, so uploads compress in parallel
+                            with ThreadPoolExecutor(max_workers=min(len(uploaded_images), 4)) as pool:
+                                image_data = list(pool.map(compress_upload, uploaded_images))
                         except Exception as e:
                             st.error(f"Fehler beim Hochladen der Bilder: {str(e)}")
                             st.stop()
                     
                     if edit_mode:
                         # Update existing wish or suggestion
-                        for wish in st.session_state.data:
-                            if wish['id'] == st.session_state.edit_wish_id:
-                                if is_suggestion:
-                                    # Update suggestion - keep suggestion-specific fields
-                                    wish.update({
-                                        "wish_name": wish_name, 
-                                        "description": wish_desc, 
-                                        "link": wish_link,
-                                        "price": wish_price,
-                                        # Keep original suggestion fields
-                                        "type": "suggestion",
-                                        "suggested_by": wish.get("suggested_by"),
-                                        "suggested_for": wish.get("suggested_for")
-                                    })
-                                else:
-                                    # Update regular wish
-                                    wish.update({
-                                        "wish_name": wish_name, "description": wish_desc, "link": wish_link,
-                                        "price": wish_price, "buy_self": buy_option == "Ich kaufe es selbst",
-                                        "others_can_buy": buy_option == "Andere dürfen es kaufen",
-                                        "responsible_person": responsible_person if responsible_person else None,
-                                    })
-                                    # Update images only if new ones were uploaded
-                                    if image_data:
-                                        wish["images"] = image_data
-                                break
-                        save_data(st.session_state.data)
-                        st.success("Wunsch aktualisiert!")
+                        wish = by_id.get(st.session_state.edit_wish_id)
+                        before = dict(wish) if wish is not None else None
+                        if wish is not None:
+                            if is_suggestion:
+                                # Update suggestion - keep suggestion-specific fields
+                                wish.update({
+                                    "wish_name": wish_name, 
+                                    "description": wish_desc, 
+                                    "link": wish_link,
+                                    "price": wish_price,
+                                    # Keep original suggestion fields
+                                    "type": "suggestion",
+                                    "suggested_by": wish.get("suggested_by"),
+                                    "suggested_for": wish.get("suggested_for")
+                                })
+                            else:
+                                # Update regular wish
+                                wish.update({
+                                    "wish_name": wish_name, "description": wish_desc, "link": wish_link,
+                                    "price": wish_price, "buy_self": buy_option == "Ich kaufe es selbst",
+                                    "others_can_buy": buy_option == "Andere dürfen es kaufen",
+                                    "responsible_person": responsible_person if responsible_person else None,
+                                })
+                                # Update images only if new ones were uploaded
+                                if image_data:
+                                    wish["images"] = image_data
+                        # Resubmitting the form unchanged shouldn't rewrite the data
+                        if wish != before:
+                            save_data(st.session_state.data)
+                            st.success("Wunsch aktualisiert!")
+                        else:
+                            st.toast("Keine Änderungen")
                         st.session_state.edit_wish_id = None
                     else:
                         # Add new wish
                         new_wish = {
-                            "id": str(uuid.uuid4()), "owner_user": st.session_state['username'],
+                            "id": secrets.token_hex(16), "owner_user": st.session_state['username'],
                             "wish_name": wish_name, "link": wish_link, "description": wish_desc,
                             "price": wish_price, "note": "", "color": "", 
                             "buy_self": buy_option == "Ich kaufe es selbst",
@@ -678,9 +944,6 @@ def wishlist_page():
         # --- Display My Wishes ---
         st.header("Meine Wunschliste")
         
-        # Calculate budget usage
-        my_wishes = [w for w in st.session_state['data'] if w.get("owner_user") == st.session_state['username']]
-        
         # Calculate total value of wishes (use actual_price if purchased, otherwise estimated price)
         total_wished = 0.0
         for wish in my_wishes:
@@ -738,48 +1001,21 @@ def wishlist_page():
             elif wish.get("buy_self"):
                 status = "🛍️ Kaufe ich selbst"
 
-            with st.container(border=True):
+            with st.container(border=True, key=f"my_wish_{wish['id']}"):
                 price_display = f"({wish['price']:.2f}€)" if wish.get('price') else ""
-                st.subheader(f"{wish['wish_name']} {price_display} {status}")
-                st.write(wish['description'])
-                if wish['link']:
-                    st.write(f"[Link zum Produkt]({wish['link']})")
+                render_card_text(
+                    f"### {wish['wish_name']} {price_display} {status}",
+                    wish['description'],
+                    f"[Link zum Produkt]({wish['link']})" if wish['link'] else "",
+                )
                 
                 # Display images
-                if wish.get('images') and isinstance(wish.get('images'), list) and len(wish.get('images', [])) > 0:
-                    try:
-                        # Filter out non-dict items (old format compatibility)
-                        valid_images = [img for img in wish.get('images', []) if isinstance(img, dict) and 'data' in img]
-                        if valid_images:
-                            cols = st.columns(min(len(valid_images), 3))
-                            for idx, img in enumerate(valid_images):
-                                with cols[idx % 3]:
-                                    image_bytes = base64.b64decode(img['data'])
-                                    st.image(image_bytes, use_container_width=True)
-                    except Exception as e:
-                        pass  # Silently skip if image decoding fails
+                render_wish_images(wish)
                 
-                # If buy_self and not purchased yet, show purchase form
+                # If buy_self and not purchased yet, offer the purchase dialog
                 if wish.get("buy_self") and not wish.get("purchased"):
-                    with st.form(key=f"self_purchase_{wish['id']}"):
-                        estimated_price = wish.get("price", 0.0)
-                        st.write(f"💰 Geschätzter Preis: {estimated_price:.2f}€")
-                        actual_price = st.number_input(
-                            "Tatsächlicher Preis (€)", 
-                            min_value=0.0, 
-                            value=estimated_price,
-                            format="%.2f",
-                            key=f"self_price_{wish['id']}"
-                        )
-                        if st.form_submit_button("✓ Als gekauft markieren"):
-                            for w in st.session_state['data']:
-                                if w['id'] == wish['id']:
-                                    w['purchased'] = True
-                                    w['actual_price'] = actual_price
-                                    w['claimed_by'] = st.session_state['username']
-                                    break
-                            save_data(st.session_state['data'])
-                            st.rerun()
+                    if st.button("✓ Als gekauft markieren", key=f"self_purchase_{wish['id']}"):
+                        purchase_dialog(wish, claim=True)
                 
                 # Edit and Delete buttons
                 col_edit, col_delete = st.columns(2)
@@ -789,19 +1025,19 @@ def wishlist_page():
                         st.rerun()
                 with col_delete:
                     if st.button(f"🗑️ Löschen", key=f"del_{wish['id']}"):
-                        st.session_state['data'] = [w for w in st.session_state['data'] if w['id'] != wish['id']]
+                        st.session_state['data'].remove(wish)
+                        st.session_state.get('img_cache', {}).pop(wish['id'], None)
                         save_data(st.session_state['data'])
                         st.rerun()
 
         # --- Display My Claimed Items ---
         st.header("📋 Meine Besorgungen")
-        my_claimed = [w for w in st.session_state['data'] if w.get("claimed_by") == st.session_state['username']]
         
         if not my_claimed:
             st.info("Du hast noch keine Geschenke für andere reserviert.")
 
         for item in my_claimed:
-            with st.container(border=True):
+            with st.container(border=True, key=f"claimed_{item['id']}"):
                 # For suggestions, use suggested_for instead of owner_user
                 recipient = item.get('suggested_for') if item.get('type') == 'suggestion' else item.get('owner_user')
                 st.subheader(f"{item.get('wish_name', 'Unbekannt')} (für {recipient or 'Unbekannt'})")
@@ -809,77 +1045,57 @@ def wishlist_page():
                     actual_price = item.get("actual_price", 0)
                     st.success(f"✅ Schon besorgt ({actual_price:.2f}€)")
                 else:
-                    estimated_price = item.get("price", 0.0)
-                    with st.form(key=f"purchase_form_{item['id']}"):
-                        st.write(f"Geschätzter Preis: {estimated_price:.2f}€")
-                        actual_price = st.number_input(
-                            "Tatsächlicher Preis (€)", 
-                            min_value=0.0, 
-                            value=estimated_price,
-                            format="%.2f",
-                            key=f"price_input_{item['id']}"
-                        )
-                        if st.form_submit_button("✓ Als gekauft markieren"):
-                            for w in st.session_state['data']:
-                                if w['id'] == item['id']:
-                                    w['purchased'] = True
-                                    w['actual_price'] = actual_price
-                                    if 'reimbursed' not in w:
-                                        w['reimbursed'] = False
-                                    break
-                            save_data(st.session_state['data'])
-                            st.rerun()
+                    estimated_price = float(item.get("price") or 0.0)
+                    status_placeholder = st.empty()
+                    with status_placeholder.container():
+                        with st.form(key=f"purchase_form_{item['id']}"):
+                            st.write(f"Geschätzter Preis: {estimated_price:.2f}€")
+                            actual_price = st.number_input(
+                                "Tatsächlicher Preis (€)", 
+                                min_value=0.0, 
+                                value=estimated_price,
+                                format="%.2f",
+                                key=f"price_input_{item['id']}"
+                            )
+                            purchased = st.form_submit_button("✓ Als gekauft markieren")
+                    if purchased:
+                        item['purchased'] = True
+                        item['actual_price'] = actual_price
+                        if 'reimbursed' not in item:
+                            item['reimbursed'] = False
+                        save_data(st.session_state['data'])
+                        # No rerun needed: swap the form for the badge here, and the sections
+                        # below (expert tasks, suggestions, spending) render from the same dicts.
+                        # That's why this card keeps its inline form instead of purchase_dialog,
+                        # which has to close with a full rerun.
+                        purchased_items.append(item)
+                        status_placeholder.success(f"✅ Schon besorgt ({actual_price:.2f}€)")
 
     # --- Column 2: Others' Wishlists ---
     with col2:
         st.header("🎁 Wunschlisten der Anderen")
-        other_wishes = [
-            w for w in st.session_state['data'] 
-            if w.get("owner_user") != st.session_state['username'] and w.get("others_can_buy")
-        ]
 
-        if not other_wishes:
+        if not wishes_by_owner:
             st.info("Es gibt derzeit keine Wünsche von anderen.")
 
-        # Group by owner
-        wishes_by_owner = {}
-        for wish in other_wishes:
-            owner = wish["owner_user"]
-            if owner not in wishes_by_owner:
-                wishes_by_owner[owner] = []
-            wishes_by_owner[owner].append(wish)
-
         for owner, wishes in wishes_by_owner.items():
             st.subheader(f"Wünsche von {owner}")
             for wish in wishes:
-                with st.container(border=True):
+                with st.container(border=True, key=f"other_wish_{wish['id']}"):
                     price_display = f"({wish['price']:.2f}€)" if wish.get('price') else ""
-                    st.write(f"**{wish['wish_name']}** {price_display}")
-                    st.write(wish['description'])
-                    if wish['link']:
-                        st.write(f"[Link]({wish['link']})")
+                    render_card_text(
+                        f"**{wish['wish_name']}** {price_display}",
+                        wish['description'],
+                        f"[Link]({wish['link']})" if wish['link'] else "",
+                    )
                     
                     # Display images
-                    if wish.get('images') and isinstance(wish['images'], list) and len(wish['images']) > 0:
-                        try:
-                            # Filter out non-dict items (old format compatibility)
-                            valid_images = [img for img in wish['images'] if isinstance(img, dict) and 'data' in img]
-                            if valid_images:
-                                cols = st.columns(min(len(valid_images), 3))
-                                for idx, img in enumerate(valid_images):
-                                    with cols[idx % 3]:
-                                        image_bytes = base64.b64decode(img['data'])
-                                        st.image(image_bytes, use_container_width=True)
-                        except Exception as e:
-                            pass  # Silently skip if image decoding fails
+                    render_wish_images(wish)
 
                     if wish.get("claimed_by") is None:
                         if st.button("Ich besorge das!", key=f"claim_{wish['id']}"):
-                            for w in st.session_state['data']:
-                                if w['id'] == wish['id']:
-                                    w['claimed_by'] = st.session_state['username']
-                                    w['claimed_at'] = datetime.datetime.now().isoformat()
-                                    break
+                            wish['claimed_by'] = st.session_state['username']
+                            wish['claimed_at'] = datetime.datetime.now().isoformat(timespec='seconds')
                             save_data(st.session_state['data'])
                             st.rerun()
                     elif wish.get("claimed_by") == st.session_state['username']:
@@ -892,7 +1108,7 @@ def wishlist_page():
         with st.expander("Einen geheimen Geschenkvorschlag für jemanden machen"):
             with st.form("suggestion_form"):
                 st.info("💡 Dein Vorschlag wird nur für andere sichtbar sein, nicht für die Person selbst!")
-                suggestion_for = st.selectbox("Für wen?", [u for u in ALL_USERS if u != st.session_state['username']])
+                suggestion_for = st.selectbox("Für wen?", OTHER_USERS_BY_USER[st.session_state['username']])
                 suggestion_name = st.text_input("Geschenkidee")
                 suggestion_desc = st.text_area("Beschreibung / Warum ist das eine gute Idee?")
                 suggestion_link = st.text_input("Link (optional)")
@@ -901,7 +1117,7 @@ def wishlist_page():
                 if st.form_submit_button("💡 Vorschlag speichern"):
                     if suggestion_name and suggestion_desc:
                         new_suggestion = {
-                            "id": str(uuid.uuid4()),
+                            "id": secrets.token_hex(16),
                             "type": "suggestion",
                             "suggested_by": st.session_state['username'],
                             "suggested_for": suggestion_for,
@@ -925,34 +1141,21 @@ def wishlist_page():
         st.header("🎁 Geschenkvorschläge von anderen")
         st.write("Hier siehst du Geschenkideen, die andere für deine Freunde/Familie vorgeschlagen haben.")
         
-        # Show suggestions FOR other people (not for the current user)
-        visible_suggestions = [
-            w for w in st.session_state['data'] 
-            if w.get("type") == "suggestion" 
-            and w.get("suggested_for") != st.session_state['username']  # NOT for me
-        ]
-        
-        if not visible_suggestions:
+        # Show suggestions FOR other people (not for the current user), grouped by person
+        if not suggestions_by_person:
             st.info("Es gibt derzeit keine Geschenkvorschläge.")
         else:
-            # Group by person
-            suggestions_by_person = {}
-            for suggestion in visible_suggestions:
-                person = suggestion['suggested_for']
-                if person not in suggestions_by_person:
-                    suggestions_by_person[person] = []
-                suggestions_by_person[person].append(suggestion)
-            
             for person, suggestions in suggestions_by_person.items():
                 st.subheader(f"Vorschläge für {person}")
                 for suggestion in suggestions:
-                    with st.container(border=True):
+                    with st.container(border=True, key=f"suggestion_{suggestion['id']}"):
                         price_display = f"({suggestion.get('price', 0.0):.2f}€)" if suggestion.get('price') else ""
-                        st.write(f"**{suggestion.get('wish_name', 'Unbekannt')}** {price_display}")
-                        st.write(f"*Vorgeschlagen von {suggestion.get('suggested_by', 'Unbekannt')}*")
-                        st.write(suggestion.get('description', ''))
-                        if suggestion.get('link'):
-                            st.write(f"[Link]({suggestion.get('link')})")
+                        render_card_text(
+                            f"**{suggestion.get('wish_name', 'Unbekannt')}** {price_display}",
+                            f"*Vorgeschlagen von {suggestion.get('suggested_by', 'Unbekannt')}*",
+                            suggestion.get('description', ''),
+                            f"[Link]({suggestion['link']})" if suggestion.get('link') else "",
+                        )
                         
                         # Check if already claimed/purchased
                         if suggestion.get("purchased"):
@@ -961,35 +1164,16 @@ def wishlist_page():
                             st.success(f"✅ Wurde bereits von {claimed_by} besorgt ({actual_price:.2f}€)")
                         elif suggestion.get("claimed_by"):
                             if suggestion["claimed_by"] == st.session_state['username']:
-                                # I claimed it - show purchase form
-                                estimated_price = suggestion.get("price", 0.0)
-                                with st.form(key=f"purchase_suggestion_{suggestion['id']}"):
-                                    st.write(f"Geschätzter Preis: {estimated_price:.2f}€")
-                                    actual_price = st.number_input(
-                                        "Tatsächlicher Preis (€)", 
-                                        min_value=0.0, 
-                                        value=estimated_price,
-                                        format="%.2f",
-                                        key=f"sugg_price_{suggestion['id']}"
-                                    )
-                                    if st.form_submit_button("✓ Als gekauft markieren"):
-                                        for w in st.session_state['data']:
-                                            if w['id'] == suggestion['id']:
-                                                w['purchased'] = True
-                                                w['actual_price'] = actual_price
-                                                break
-                                        save_data(st.session_state['data'])
-                                        st.rerun()
+                                # I claimed it - offer the purchase dialog
+                                if st.button("✓ Als gekauft markieren", key=f"purchase_suggestion_{suggestion['id']}"):
+                                    purchase_dialog(suggestion)
                             else:
                                 st.warning(f"Wird bereits von {suggestion['claimed_by']} besorgt.")
                         else:
                             # Available to claim
                             if st.button("Ich besorge das!", key=f"claim_sugg_{suggestion['id']}"):
-                                for w in st.session_state['data']:
-                                    if w['id'] == suggestion['id']:
-                                        w['claimed_by'] = st.session_state['username']
-                                        w['claimed_at'] = datetime.datetime.now().isoformat()
-                                        break
+                                suggestion['claimed_by'] = st.session_state['username']
+                                suggestion['claimed_at'] = datetime.datetime.now().isoformat(timespec='seconds')
                                 save_data(st.session_state['data'])
                                 st.rerun()
                         
@@ -1002,37 +1186,26 @@ def wishlist_page():
                                     st.rerun()
                             with col_delete_sugg:
                                 if st.button(f"🗑️ Löschen", key=f"del_sugg_{suggestion['id']}"):
-                                    st.session_state['data'] = [w for w in st.session_state['data'] if w['id'] != suggestion['id']]
+                                    st.session_state['data'].remove(suggestion)
                                     save_data(st.session_state['data'])
                                     st.rerun()
 
         # --- Display My Expert Assignments ---
         st.header("👨‍🏫 Meine Expertenaufträge")
-        my_expert_tasks = [w for w in st.session_state['data'] if w.get("responsible_person") == st.session_state['username']]
 
         if not my_expert_tasks:
             st.info("Dir wurden keine Expertenaufträge zugewiesen.")
         
         for task in my_expert_tasks:
-            with st.container(border=True):
-                st.subheader(f"{task.get('wish_name', 'Unbekannt')} (für {task.get('owner_user', 'Unbekannt')})")
-                st.write(f"**Beschreibung:** {task.get('description', '')}")
-                if task.get('link'):
-                    st.write(f"[Link zum Produkt]({task.get('link')})")
+            with st.container(border=True, key=f"expert_task_{task['id']}"):
+                render_card_text(
+                    f"### {task.get('wish_name', 'Unbekannt')} (für {task.get('owner_user', 'Unbekannt')})",
+                    f"**Beschreibung:** {task.get('description', '')}",
+                    f"[Link zum Produkt]({task['link']})" if task.get('link') else "",
+                )
                 
                 # Display images
-                if task.get('images') and isinstance(task['images'], list) and len(task['images']) > 0:
-                    try:
-                        # Filter out non-dict items (old format compatibility)
-                        valid_images = [img for img in task['images'] if isinstance(img, dict) and 'data' in img]
-                        if valid_images:
-                            cols = st.columns(min(len(valid_images), 3))
-                            for idx, img in enumerate(valid_images):
-                                with cols[idx % 3]:
-                                    image_bytes = base64.b64decode(img['data'])
-                                    st.image(image_bytes, use_container_width=True)
-                    except Exception as e:
-                        pass  # Silently skip if image decoding fails
+                render_wish_images(task)
                 
                 # Check if already purchased by expert
                 if task.get("claimed_by") == st.session_state['username'] and task.get("purchased"):
@@ -1040,89 +1213,21 @@ def wishlist_page():
                     st.success(f"✅ Du hast dieses Geschenk besorgt ({actual_price:.2f}€)")
                 # Check if expert has claimed it but not purchased yet
                 elif task.get("claimed_by") == st.session_state['username']:
-                    estimated_price = task.get("price", 0.0)
-                    with st.form(key=f"expert_purchase_form_{task['id']}"):
-                        st.write(f"Geschätzter Preis: {estimated_price:.2f}€")
-                        actual_price = st.number_input(
-                            "Tatsächlicher Preis (€)", 
-                            min_value=0.0, 
-                            value=estimated_price,
-                            format="%.2f",
-                            key=f"expert_price_input_{task['id']}"
-                        )
-                        if st.form_submit_button("✓ Als gekauft markieren"):
-                            for w in st.session_state['data']:
-                                if w['id'] == task['id']:
-                                    w['purchased'] = True
-                                    w['actual_price'] = actual_price
-                                    break
-                            save_data(st.session_state['data'])
-                            st.rerun()
+                    if st.button("✓ Als gekauft markieren", key=f"expert_purchase_{task['id']}"):
+                        purchase_dialog(task)
                 # Check if someone else has claimed it
                 elif task.get("claimed_by") and task.get("claimed_by") != st.session_state['username']:
                     st.info(f"Wird bereits von {task['claimed_by']} besorgt.")
                 # Not claimed yet - allow expert to claim
                 else:
                     if st.button("Ich besorge das!", key=f"expert_claim_{task['id']}"):
-                        for w in st.session_state['data']:
-                            if w['id'] == task['id']:
-                                w['claimed_by'] = st.session_state['username']
-                                w['claimed_at'] = datetime.datetime.now().isoformat()
-                                break
+                        task['claimed_by'] = st.session_state['username']
+                        task['claimed_at'] = datetime.datetime.now().isoformat(timespec='seconds')
                         save_data(st.session_state['data'])
                         st.rerun()
 
         # --- Cost Summary Table ---
-        st.header("💰 Meine Ausgaben")
-        purchased_items = [
-            w for w in st.session_state['data'] 
-            if w.get("claimed_by") == st.session_state['username'] and w.get("purchased")
-        ]
-
-        if not purchased_items:
-            st.info("Du hast noch keine Geschenke als gekauft markiert.")
-        else:
-            import pandas as pd
-            
-            table_data = []
-            for item in purchased_items:
-                reimbursed_status = "✅ Ja" if item.get('reimbursed', False) else "❌ Nein"
-                # For suggestions, use suggested_for instead of owner_user
-                recipient = item.get('suggested_for') if item.get('type') == 'suggestion' else item.get('owner_user')
-                table_data.append({
-                    "Geschenk": item.get('wish_name', 'Unbekannt'),
-                    "Für": recipient or 'Unbekannt',
-                    "Geschätzter Preis": f"{item.get('price', 0.0):.2f}€",
-                    "Tatsächlicher Preis": f"{item.get('actual_price', 0.0):.2f}€",
-                    "Erstattet": reimbursed_status
-                })
-            
-            df = pd.DataFrame(table_data)
-            st.dataframe(df, use_container_width=True, hide_index=True)
-            
-            total_spent = sum(item.get('actual_price', 0.0) for item in purchased_items)
-            total_reimbursed = sum(item.get('actual_price', 0.0) for item in purchased_items if item.get('reimbursed', False))
-            total_outstanding = total_spent - total_reimbursed
-            
-            st.markdown(f"### **Gesamtausgaben: {total_spent:.2f}€**")
-            st.markdown(f"**Erstattet: {total_reimbursed:.2f}€**")
-            st.markdown(f"**Noch offen: {total_outstanding:.2f}€**")
-            
-            # Allow marking items as reimbursed
-            st.subheader("Erstattung markieren")
-            for item in purchased_items:
-                if not item.get('reimbursed', False):
-                    col1, col2 = st.columns([3, 1])
-                    with col1:
-                        st.write(f"{item.get('wish_name', 'Unbekannt')} ({item.get('actual_price', 0.0):.2f}€)")
-                    with col2:
-                        if st.button("✓ Erstattet", key=f"reimburse_{item['id']}"):
-                            for w in st.session_state['data']:
-                                if w['id'] == item['id']:
-                                    w['reimbursed'] = True
-                                    break
-                            save_data(st.session_state['data'])
-                            st.rerun()
+        my_spending_section(purchased_items)
 
         # --- Super User View: See Others' Spending ---
         if st.session_state['username'] in SUPER_USERS:
@@ -1130,37 +1235,35 @@ def wishlist_page():
             
             # Super users can see everyone's spending except purchases made FOR themselves
             # They CAN see the other super user's spending
-            users_to_show = [u for u in ALL_USERS if u != st.session_state['username']]
+            users_to_show = OTHER_USERS_BY_USER[st.session_state['username']]
             
             for user in users_to_show:
                 # Get all purchases by this user, but exclude gifts that are FOR the current super user
                 user_purchased = [
-                    w for w in st.session_state['data'] 
-                    if w.get("claimed_by") == user 
-                    and w.get("purchased") 
-                    and w.get("owner_user") != st.session_state['username']
+                    w for w in purchased_by_user[user]
+                    if w.get("owner_user") != st.session_state['username']
                 ]
                 
                 if user_purchased:
                     with st.expander(f"💰 {user}s Ausgaben"):
-                        import pandas as pd
-                        
+                        # Rows and totals in one pass; st.dataframe takes the row dicts directly
                         table_data = []
+                        user_total = user_reimbursed = 0.0
                         for item in user_purchased:
-                            reimbursed_status = "✅ Ja" if item.get('reimbursed', False) else "❌ Nein"
+                            actual_price = item.get('actual_price', 0.0)
+                            user_total += actual_price
+                            if item.get('reimbursed', False):
+                                user_reimbursed += actual_price
                             table_data.append({
                                 "Geschenk": item.get('wish_name', 'Unbekannt'),
                                 "Für": item.get('owner_user', 'Unbekannt'),
                                 "Geschätzter Preis": f"{item.get('price', 0.0):.2f}€",
-                                "Tatsächlicher Preis": f"{item.get('actual_price', 0.0):.2f}€",
-                                "Erstattet": reimbursed_status
+                                "Tatsächlicher Preis": f"{actual_price:.2f}€",
+                                "Erstattet": "✅ Ja" if item.get('reimbursed', False) else "❌ Nein"
                             })
                         
-                        df = pd.DataFrame(table_data)
-                        st.dataframe(df, use_container_width=True, hide_index=True)
+                        st.dataframe(table_data, use_container_width=True, hide_index=True)
                         
-                        user_total = sum(item.get('actual_price', 0.0) for item in user_purchased)
-                        user_reimbursed = sum(item.get('actual_price', 0.0) for item in user_purchased if item.get('reimbursed', False))
                         user_outstanding = user_total - user_reimbursed
                         
                         st.markdown(f"**{user} Gesamt: {user_total:.2f}€**")
@@ -1170,6 +1273,108 @@ def wishlist_page():
                     st.info(f"{user} hat noch keine sichtbaren Geschenke als gekauft markiert.")
 
 
+@st.fragment
+def my_spending_section(purchased_items: List[Dict[str, Any]]):
+    """Display the spending table; ticking reimbursements in it only reruns this section."""
+    st.header("💰 Meine Ausgaben")
+
+    if not purchased_items:
+        st.info("Du hast noch keine Geschenke als gekauft markiert.")
+    else:
+        table_data = []
+        for item in purchased_items:
+            # For suggestions, use suggested_for instead of owner_user
+            recipient = item.get('suggested_for') if item.get('type') == 'suggestion' else item.get('owner_user')
+            table_data.append({
+                "Geschenk": item.get('wish_name', 'Unbekannt'),
+                "Für": recipient or 'Unbekannt',
+                "Geschätzter Preis": f"{item.get('price', 0.0):.2f}€",
+                "Tatsächlicher Preis": f"{item.get('actual_price', 0.0):.2f}€",
+                "Erstattet": bool(item.get('reimbursed', False))
+            })
+
+        # Reimbursements are ticked directly in the table; data_editor returns the row dicts as-is
+        edited = st.data_editor(
+            table_data, use_container_width=True, hide_index=True, key="spending_editor",
+            disabled=[col for col in table_data[0] if col != "Erstattet"],
+            column_config={"Erstattet": st.column_config.CheckboxColumn("Erstattet")}
+        )
+        changed = [i for i, (old, new) in enumerate(zip(table_data, edited)) if old["Erstattet"] != new["Erstattet"]]
+        if changed:
+            for i in changed:
+                purchased_items[i]['reimbursed'] = bool(edited[i]["Erstattet"])
+            save_data(st.session_state['data'])
+
+        total_spent = total_reimbursed = 0.0
+        for item in purchased_items:
+            actual_price = item.get('actual_price', 0.0)
+            total_spent += actual_price
+            if item.get('reimbursed', False):
+                total_reimbursed += actual_price
+        total_outstanding = total_spent - total_reimbursed
+
+        st.markdown(f"### **Gesamtausgaben: {total_spent:.2f}€**")
+        st.markdown(f"**Erstattet: {total_reimbursed:.2f}€**")
+        st.markdown(f"**Noch offen: {total_outstanding:.2f}€**")
+
+
+@st.fragment
+def dish_card(dish: Dict[str, Any]):
+    """Display one dish proposal; voting only reruns this card."""
+    with st.container(border=True, key=f"dish_{dish['id']}"):
+        col1, col2 = st.columns([3, 1])
+
+        with col1:
+            st.write(f"**{dish['name']}**")
+            if dish.get('description'):
+                st.write(f"_{dish['description']}_")
+            st.caption(f"Vorgeschlagen von {dish['proposed_by']}")
+            if dish.get('responsible'):
+                st.caption(f"👨‍🍳 Verantwortlich: {dish['responsible']}")
+
+        with col2:
+            # Vote count
+            votes = dish.get('votes', [])
+            vote_count = len(votes)
+            st.metric("👍", vote_count)
+            if votes:
+                st.caption(f"{', '.join(votes)}")
+
+            # Vote button
+            user_voted = st.session_state['username'] in votes
+            if user_voted:
+                if st.button("❌", key=f"unvote_dish_{dish['id']}", help="Stimme zurückziehen"):
+                    # dish is the same object as in the proposals list
+                    if 'votes' not in dish:
+                        dish['votes'] = []
+                    if isinstance(dish['votes'], list) and st.session_state['username'] in dish['votes']:
+                        dish['votes'].remove(st.session_state['username'])
+                    save_planning_data(st.session_state.planning_data)
+                    st.rerun(scope="fragment")
+            else:
+                if st.button("👍", key=f"vote_dish_{dish['id']}", help="Dafür stimmen"):
+                    # dish is the same object as in the proposals list
+                    if 'votes' not in dish:
+                        dish['votes'] = []
+                    if not isinstance(dish['votes'], list):
+                        dish['votes'] = list(dish['votes']) if dish['votes'] else []
+                    if st.session_state['username'] not in dish['votes']:
+                        dish['votes'].append(st.session_state['username'])
+                    save_planning_data(st.session_state.planning_data)
+                    st.rerun(scope="fragment")
+
+    # Delete button for creator
+    if dish['proposed_by'] == st.session_state['username']:
+        if st.button("🗑️", key=f"del_dish_{dish['id']}", help="Löschen"):
+            st.session_state.planning_data['meal_proposals'].remove(dish)
+            # Remove from day assignments
+            for day_date in st.session_state.planning_data['day_assignments']:
+                if st.session_state.planning_data['day_assignments'][day_date] == dish['id']:
+                    st.session_state.planning_data['day_assignments'][day_date] = None
+            save_planning_data(st.session_state.planning_data)
+            st.rerun()
+
+
 def meal_planning_page():
     """Display the meal planning page with dish proposals and day assignments."""
     
@@ -1202,6 +1407,13 @@ def meal_planning_page():
         {"date": "2025-12-26", "name": "2. Weihnachtstag (26.12.)", "emoji": "🎁"}
     ]
     
+    # Index dishes by id and group them by category in one pass, for both columns
+    dishes_by_id = {}
+    dishes_by_category = defaultdict(list)
+    for d in st.session_state.planning_data['meal_proposals']:
+        dishes_by_id[d['id']] = d
+        dishes_by_category[d.get('category')].append(d)
+    
     # Two columns layout
     col_proposals, col_schedule = st.columns([1, 1])
     
@@ -1220,7 +1432,7 @@ def meal_planning_page():
                 if st.form_submit_button("💾 Vorschlag speichern"):
                     if dish_name:
                         new_dish = {
-                            "id": str(uuid.uuid4()),
+                            "id": secrets.token_hex(16),
                             "name": dish_name,
                             "category": category,
                             "description": dish_desc,
@@ -1245,73 +1457,13 @@ def meal_planning_page():
             
             # Group dishes by category
             for cat_name, cat_emoji in categories.items():
-                dishes_in_category = [d for d in st.session_state.planning_data['meal_proposals'] if d.get('category') == cat_name]
+                dishes_in_category = dishes_by_category.get(cat_name)
                 
                 if dishes_in_category:
                     st.markdown(f"### {cat_emoji} {cat_name}")
                     
                     for dish in dishes_in_category:
-                        with st.container(border=True):
-                            col1, col2 = st.columns([3, 1])
-                            
-                            with col1:
-                                st.write(f"**{dish['name']}**")
-                                if dish.get('description'):
-                                    st.write(f"_{dish['description']}_")
-                                st.caption(f"Vorgeschlagen von {dish['proposed_by']}")
-                                if dish.get('responsible'):
-                                    st.caption(f"👨‍🍳 Verantwortlich: {dish['responsible']}")
-                            
-                            with col2:
-                                # Vote count
-                                votes = dish.get('votes', [])
-                                vote_count = len(votes)
-                                st.metric("👍", vote_count)
-                                if votes:
-                                    st.caption(f"{', '.join(votes)}")
-                                
-                                # Vote button
-                                user_voted = st.session_state['username'] in votes
-                                if user_voted:
-                                    if st.button("❌", key=f"unvote_dish_{dish['id']}", help="Stimme zurückziehen"):
-                                        # Find the dish in the original list and update it
-                                        for d in st.session_state.planning_data['meal_proposals']:
-                                            if d['id'] == dish['id']:
-                                                if 'votes' not in d:
-                                                    d['votes'] = []
-                                                if isinstance(d['votes'], list) and st.session_state['username'] in d['votes']:
-                                                    d['votes'].remove(st.session_state['username'])
-                                                break
-                                        save_planning_data(st.session_state.planning_data)
-                                        st.rerun()
-                                else:
-                                    if st.button("👍", key=f"vote_dish_{dish['id']}", help="Dafür stimmen"):
-                                        # Find the dish in the original list and update it
-                                        for d in st.session_state.planning_data['meal_proposals']:
-                                            if d['id'] == dish['id']:
-                                                if 'votes' not in d:
-                                                    d['votes'] = []
-                                                if not isinstance(d['votes'], list):
-                                                    d['votes'] = list(d['votes']) if d['votes'] else []
-                                                if st.session_state['username'] not in d['votes']:
-                                                    d['votes'].append(st.session_state['username'])
-                                                break
-                                        save_planning_data(st.session_state.planning_data)
-                                        st.rerun()
-                        
-                        # Delete button for creator
-                        if dish['proposed_by'] == st.session_state['username']:
-                            if st.button("🗑️", key=f"del_dish_{dish['id']}", help="Löschen"):
-                                st.session_state.planning_data['meal_proposals'] = [
-                                    d for d in st.session_state.planning_data['meal_proposals'] 
-                                    if d['id'] != dish['id']
-                                ]
-                                # Remove from day assignments
-                                for day_date in st.session_state.planning_data['day_assignments']:
-                                    if st.session_state.planning_data['day_assignments'][day_date] == dish['id']:
-                                        st.session_state.planning_data['day_assignments'][day_date] = None
-                                save_planning_data(st.session_state.planning_data)
-                                st.rerun()
+                        dish_card(dish)
     
     # Right column: Day schedule
     with col_schedule:
@@ -1338,7 +1490,7 @@ def meal_planning_page():
                 if assigned_dishes:
                     for dish_id in assigned_dishes:
                         # Find dish details
-                        dish = next((d for d in st.session_state.planning_data['meal_proposals'] if d['id'] == dish_id), None)
+                        dish = dishes_by_id.get(dish_id)
                         if dish:
                             col_dish, col_remove = st.columns([4, 1])
                             with col_dish:
@@ -1352,7 +1504,7 @@ def meal_planning_page():
                                     st.rerun()
                 
                 # Add new dish to category
-                dishes_for_category = [d for d in st.session_state.planning_data['meal_proposals'] if d.get('category') == cat_name]
+                dishes_for_category = dishes_by_category.get(cat_name)
                 
                 if dishes_for_category:
                     dish_names = ["➕ Hinzufügen..."] + [d['name'] for d in dishes_for_category]
@@ -1504,8 +1656,6 @@ def attendance_page():
     if not st.session_state.planning_data['attendance']:
         st.info("Noch niemand hat seine Anwesenheit eingetragen.")
     else:
-        import pandas as pd
-        
         for day in days:
             st.write(f"**{day['name']}**")
             
@@ -1561,7 +1711,6 @@ def advent_calendar_page():
     
     # Create a consistent random mapping of days to images using a fixed seed
     # This ensures ALL users see the same image for the same day
-    import random
     rng = random.Random(2025)  # Use separate Random instance with fixed seed
     if len(image_files) >= 24:
         shuffled_images = image_files.copy()
@@ -0,0 +1,50 @@
+"""Regression tests for the Gradio app's wish store."""
+
+import importlib
+import sys
+from pathlib import Path
+
+import orjson
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+def test_load_data_accepts_wishes_written_by_streamlit_app(tmp_path, monkeypatch):
+    # app builds its Blocks (and loads wunschliste.json) at import, so import it inside the temp dir
+    monkeypatch.chdir(tmp_path)
+    app = importlib.import_module("app")
+    app.DATA_FILE.write_bytes(orjson.dumps([
+        {
+            "id": "st-wish", "owner_user": "Pia", "wish_name": "Buch", "description": "<b>d</b>",
+            "link": "", "price": 10.0, "buy_self": False, "others_can_buy": True,
+            "images": [{"data": "aGVsbG8=", "type": "image/jpeg"}, "images/photo.jpg"],
+            "claimed_by": None, "purchased": False,
+        },
+        {
+            "id": "st-suggestion", "type": "suggestion", "suggested_by": "Tim", "suggested_for": "Pia",
+            "wish_name": "Schal", "description": "warm", "link": "", "price": 20.0, "images": [],
+            "claimed_by": "Lukas", "purchased": False,
+        },
+    ]))
+
+    store = app.load_data()
+
+    wish = store.by_id["st-wish"]
+    assert wish["_images_html"] == ["images/photo.jpg"]
+    assert wish["_desc_html"] == "&lt;b&gt;d&lt;/b&gt;"
+    assert store.by_owner["Pia"] == [wish]
+    assert app._card_fields(store.by_id["st-suggestion"])["owner_user"] == "Pia"
+
+
+def test_append_event_keeps_data_file_current_for_other_readers(tmp_path, monkeypatch):
+    # The Streamlit app reads wunschliste.json directly and never replays the journal
+    monkeypatch.chdir(tmp_path)
+    app = importlib.import_module("app")
+    app.DATA_FILE.write_bytes(orjson.dumps([
+        {"id": "w", "owner_user": "Pia", "wish_name": "Buch", "description": "", "images": [], "claimed_by": None},
+    ]))
+
+    app.append_event({"op": "update", "id": "w", "fields": {"claimed_by": "Tim"}})
+
+    assert orjson.loads(app.DATA_FILE.read_bytes())[0]["claimed_by"] == "Tim"
+    assert not app.LOG_FILE.exists()